@@ -24,7 +24,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config.web_settings import WebConfig, initialize_web_config
 from config.github_settings import GitHubConfig
-from utils.chatbot import WikiChatbot
+from utils.chatbot import get_chatbot
 from utils.session_manager import SessionManager
 from utils.github_sync import GitHubDataSync
 import threading
@@ -108,7 +108,7 @@ def main() -> None:
         settings_main()
     else:
         # チャット機能
-        chatbot = WikiChatbot()
+        chatbot = get_chatbot()
 
         # 商材が選択されている場合はチャット画面を表示
         if "selected_product" in st.session_state and st.session_state["selected_product"]:
@@ -139,6 +139,53 @@ class PersistentDatabase:
 
             conn.commit()
 
+    def save_chat_messages_bulk(self, messages: List[Tuple[str, str, str, str, str, str, str]]):
+        """チャットメッセージをまとめて保存（1トランザクション）
+
+        各要素は (timestamp, session_id, product_name, user_message, bot_response, sources_used, prompt_style)
+        """
+        if not messages:
+            return
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany("""
+                INSERT INTO chat_history
+                (timestamp, session_id, product_name, user_message,
+                 bot_response, sources_used, prompt_style, message_length,
+                 response_length, sources_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    timestamp,
+                    session_id,
+                    product_name,
+                    user_message,
+                    bot_response,
+                    sources_used,
+                    prompt_style,
+                    len(user_message),
+                    len(bot_response),
+                    len(sources_used.split(";")) if sources_used else 0
+                )
+                for timestamp, session_id, product_name, user_message, bot_response, sources_used, prompt_style
+                in messages
+            ])
+
+            # セッション情報更新（行ごとに順に適用されるためメッセージ数も正しく加算される）
+            conn.executemany("""
+                INSERT OR REPLACE INTO sessions
+                (session_id, product_name, start_time, last_activity, total_messages)
+                VALUES (?, ?,
+                    COALESCE((SELECT start_time FROM sessions WHERE session_id = ?), ?),
+                    ?,
+                    COALESCE((SELECT total_messages FROM sessions WHERE session_id = ?), 0) + 1)
+            """, [
+                (session_id, product_name, session_id, timestamp, timestamp, session_id)
+                for timestamp, session_id, product_name, *_ in messages
+            ])
+
+            conn.commit()
+
     def save_feedback(self, session_id: str, product_name: str, satisfaction: str,
                      total_messages: int, prompt_style: str, session_duration: str = "",
                      feedback_text: str = ""):
@@ -32,6 +32,7 @@ class RAGConfig:
     embedding_model: str
     vector_store_type: str
     similarity_threshold: float
+    context_token_budget: int = 3000  # LLMに渡す検索コンテキストの上限トークン数
 
 
 @dataclass
@@ -45,6 +46,7 @@ class SystemConfig:
     session_timeout_minutes: int
     log_level: str
     enable_debug_mode: bool
+    semantic_cache_threshold: float = 0.95
 
 
 class Settings:
@@ -172,6 +174,7 @@ class Settings:
             embedding_model="text-embedding-ada-002",
             vector_store_type="chromadb",
             similarity_threshold=0.7,
+            context_token_budget=3000,
         ),
         "short_docs": RAGConfig(
             chunk_size=500,
@@ -180,6 +183,7 @@ class Settings:
             embedding_model="text-embedding-ada-002",
             vector_store_type="chromadb",
             similarity_threshold=0.75,
+            context_token_budget=2000,
         ),
         "long_docs": RAGConfig(
             chunk_size=1500,
@@ -188,6 +192,7 @@ class Settings:
             embedding_model="text-embedding-ada-002",
             vector_store_type="chromadb",
             similarity_threshold=0.65,
+            context_token_budget=4500,
         ),
         "technical": RAGConfig(
             chunk_size=2000,
@@ -196,6 +201,7 @@ class Settings:
             embedding_model="text-embedding-ada-002",
             vector_store_type="chromadb",
             similarity_threshold=0.6,
+            context_token_budget=6000,
         ),
     }
 
@@ -208,6 +214,7 @@ class Settings:
         session_timeout_minutes=60,
         log_level="INFO",
         enable_debug_mode=False,
+        semantic_cache_threshold=0.95,
     )
 
     # === プロンプトテンプレート（廃止予定） ===
@@ -249,7 +256,7 @@ class Settings:
         else:
             # 存在しない場合は最初のモデルを返し、セッション状態を更新
             default_model = models[0]
-            st.session_state[session_key] = default_model
+            set_tracked_session_setting(session_key, default_model)
             return default_model
 
     @classmethod
@@ -257,6 +264,9 @@ class Settings:
         """デフォルトのRAG設定を取得"""
         return st.session_state.get("selected_rag_config", "general")
 
+    # (プロンプト読み込み世代, デフォルトスタイル) の記憶値
+    _default_prompt_style_memo: Optional[tuple] = None
+
     @classmethod
     def get_default_prompt_style(cls) -> str:
         """デフォルトのプロンプトスタイルを取得"""
@@ -264,15 +274,22 @@ class Settings:
             # 循環インポート回避のため、必要時のみインポート
             from utils.prompt_manager import prompt_manager
 
+            # プロンプトが再読み込みされるまで結果は変わらないため世代番号で記憶
+            memo = cls._default_prompt_style_memo
+            if memo is not None and memo[0] == prompt_manager.generation:
+                return memo[1]
+
             available_prompts = prompt_manager.get_available_prompts()
+            generic_prompts = available_prompts.get("generic", [])
 
-            # まず汎用プロンプトから'general'を探す
-            if "generic" in available_prompts and "general" in available_prompts["generic"]:
-                return "general"
+            # まず汎用プロンプトから'general'を探し、ない場合は最初の汎用プロンプトを使用
+            if "general" in generic_prompts or not generic_prompts:
+                style = "general"
+            else:
+                style = generic_prompts[0]
 
-            # 'general'がない場合は最初の汎用プロンプトを使用
-            if "generic" in available_prompts and available_prompts["generic"]:
-                return available_prompts["generic"][0]
+            cls._default_prompt_style_memo = (prompt_manager.generation, style)
+            return style
         except Exception:
             # エラー時は安全なデフォルト値を返す
             pass
@@ -280,6 +297,11 @@ class Settings:
         # 何もない場合はフォールバック
         return "general"
 
+    @classmethod
+    def invalidate(cls) -> None:
+        """記憶済みの設定値を破棄（設定・プロンプト更新時に使用）"""
+        cls._default_prompt_style_memo = None
+
     @classmethod
     def get_company_name(cls) -> str:
         """会社名を取得"""
@@ -394,3 +416,13 @@ def update_session_settings(**kwargs):
     """セッション設定を更新"""
     for key, value in kwargs.items():
         st.session_state[key] = value
+
+
+# 設定リセット対象となるセッションキーの追跡用
+TRACKED_SETTING_KEYS = "tracked_setting_keys"
+
+
+def set_tracked_session_setting(key: str, value: Any) -> None:
+    """設定リセット時に削除できるよう、キーを追跡しながらセッション設定を更新"""
+    st.session_state[key] = value
+    st.session_state.setdefault(TRACKED_SETTING_KEYS, set()).add(key)
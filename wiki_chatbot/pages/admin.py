@@ -578,7 +578,7 @@ def _export_data(selected_product, export_type):
                 label=f"📁 {os.path.basename(export_path)} をダウンロード",
                 data=f.read(),
                 file_name=os.path.basename(export_path),
-                mime="text/csv",
+                mime="application/vnd.apache.parquet" if export_path.endswith(".parquet") else "text/csv",
                 use_container_width=True,
             )
 
@@ -7,10 +7,16 @@ import streamlit as st
 import yaml
 import os
 from typing import Dict, Any, List
-from utils.prompt_manager import prompt_manager
 from utils.session_manager import SessionManager
 
 
+@st.cache_data
+def _get_rag_prompt(category: str, variant: str, prompt_part: str, generation: int) -> str:
+    """RAGプロンプトを取得（リラン間でキャッシュ、プロンプト再読み込みの世代をキーに含めて更新を反映）"""
+    from utils.prompt_manager import prompt_manager
+
+    return prompt_manager.get_rag_prompt(category, variant, prompt_part) or ""
+
 
 def show_prompt_settings():
     """プロンプト設定画面のメイン関数"""
@@ -22,29 +28,20 @@ def show_prompt_settings():
         if not SessionManager.authenticate_user():
             return
 
+    # prompt_manager（YAML読み込みを伴う）は各画面関数内で遅延インポートし、
+    # 未認証のリランでは読み込まないようにする
     st.title("🎯 プロンプト設定管理")
     st.write("外部設定ファイルによるプロンプト管理システム")
 
     # サイドバーでモードを選択
-    mode = st.sidebar.selectbox(
-        "操作モード",
-        ["プロンプト一覧", "プロンプト編集", "新規プロンプト作成", "プロンプトプレビュー", "設定ファイル管理"],
-    )
-
-    if mode == "プロンプト一覧":
-        show_prompt_list()
-    elif mode == "プロンプト編集":
-        show_prompt_editor()
-    elif mode == "新規プロンプト作成":
-        show_prompt_creator()
-    elif mode == "プロンプトプレビュー":
-        show_prompt_preview()
-    elif mode == "設定ファイル管理":
-        show_config_file_manager()
+    mode = st.sidebar.selectbox("操作モード", list(MODE_HANDLERS))
+
+    MODE_HANDLERS[mode]()
 
 
 def show_prompt_list():
     """プロンプト一覧表示"""
+    from utils.prompt_manager import prompt_manager
 
     st.header("📋 利用可能なプロンプト一覧")
 
@@ -69,10 +66,13 @@ def show_prompt_list():
         st.write("**汎用プロンプト:**")
         for prompt_type in available_prompts["generic"]:
             info = prompt_manager.get_prompt_info(prompt_type)
-            with st.expander(f"📝 {info.get('name', prompt_type)}"):
+            name = info.get("name", prompt_type)
+            description = info.get("description", "なし")
+            kind = info.get("type", "generic")
+            with st.expander(f"📝 {name}"):
                 st.write(f"**タイプ:** {prompt_type}")
-                st.write(f"**説明:** {info.get('description', 'なし')}")
-                st.write(f"**分類:** {info.get('type', 'generic')}")
+                st.write(f"**説明:** {description}")
+                st.write(f"**分類:** {kind}")
 
                 # プロンプト内容のプレビュー
                 system_prompt = prompt_manager.get_system_prompt(
@@ -85,10 +85,13 @@ def show_prompt_list():
         st.write("**製品固有プロンプト:**")
         for prompt_type in available_prompts["product_specific"]:
             info = prompt_manager.get_prompt_info(prompt_type, product_name)
-            with st.expander(f"🎯 {info.get('name', prompt_type)}"):
+            name = info.get("name", prompt_type)
+            description = info.get("description", "なし")
+            target_product = info.get("product", product_name)
+            with st.expander(f"🎯 {name}"):
                 st.write(f"**タイプ:** {prompt_type}")
-                st.write(f"**説明:** {info.get('description', 'なし')}")
-                st.write(f"**対象製品:** {info.get('product', product_name)}")
+                st.write(f"**説明:** {description}")
+                st.write(f"**対象製品:** {target_product}")
 
                 # プロンプト内容のプレビュー
                 system_prompt = prompt_manager.get_system_prompt(prompt_type, product_name=product_name)
@@ -99,8 +102,8 @@ def show_prompt_list():
         st.write("**RAG処理プロンプト:**")
         for category in available_prompts["rag"]:
             with st.expander(f"🔍 {category}"):
-                system_prompt = prompt_manager.get_rag_prompt(category, "generic", "system_prompt")
-                user_prompt = prompt_manager.get_rag_prompt(category, "generic", "user_prompt")
+                system_prompt = _get_rag_prompt(category, "generic", "system_prompt", prompt_manager.generation)
+                user_prompt = _get_rag_prompt(category, "generic", "user_prompt", prompt_manager.generation)
 
                 if system_prompt:
                     st.write("**システムプロンプト:**")
@@ -131,6 +134,7 @@ def show_prompt_editor():
 
 def edit_generic_prompts():
     """汎用プロンプトの編集"""
+    from utils.prompt_manager import prompt_manager
 
     available_prompts = prompt_manager.get_available_prompts()
     generic_prompts = available_prompts.get("generic", [])
@@ -165,6 +169,7 @@ def edit_generic_prompts():
 
 def edit_product_prompts():
     """製品別プロンプトの編集"""
+    from utils.prompt_manager import prompt_manager
 
     products = prompt_manager.list_products()
     if not products:
@@ -190,6 +195,7 @@ def edit_product_prompts():
 
 def edit_rag_prompts():
     """RAGプロンプトの編集"""
+    from utils.prompt_manager import prompt_manager
 
     available_prompts = prompt_manager.get_available_prompts()
     rag_categories = available_prompts.get("rag", [])
@@ -206,6 +212,7 @@ def edit_rag_prompts():
 
 def show_prompt_creator():
     """新規プロンプト作成機能"""
+    from utils.prompt_manager import prompt_manager
 
     st.header("➕ 新規プロンプト作成")
 
@@ -243,6 +250,7 @@ def show_prompt_creator():
 
 def show_prompt_preview():
     """プロンプトプレビュー機能"""
+    from utils.prompt_manager import prompt_manager
 
     st.header("👀 プロンプトプレビュー")
 
@@ -285,13 +293,13 @@ def show_prompt_preview():
 
             # プロンプト統計
             st.subheader("📊 プロンプト統計")
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("文字数", len(generated_prompt))
-            with col2:
-                st.metric("推定トークン数", len(generated_prompt) // 4)
-            with col3:
-                st.metric("行数", generated_prompt.count("\n") + 1)
+            prompt_length = len(generated_prompt)
+            st.table(
+                {
+                    "指標": ["文字数", "推定トークン数", "行数"],
+                    "値": [prompt_length, prompt_length // 4, generated_prompt.count("\n") + 1],
+                }
+            )
 
         except Exception as e:
             st.error(f"プロンプト生成エラー: {str(e)}")
@@ -299,6 +307,7 @@ def show_prompt_preview():
 
 def show_config_file_manager():
     """設定ファイル管理機能"""
+    from utils.prompt_manager import prompt_manager
 
     st.header("📁 設定ファイル管理")
 
@@ -309,6 +318,7 @@ def show_config_file_manager():
         if st.button("🔄 設定再読み込み"):
             try:
                 prompt_manager.reload_prompts()
+                _get_rag_prompt.clear()
                 st.success("プロンプト設定を再読み込みしました")
                 st.experimental_rerun()
             except Exception as e:
@@ -345,6 +355,7 @@ def show_config_file_manager():
 
 def show_config_validation():
     """設定検証結果表示"""
+    from utils.prompt_manager import prompt_manager
 
     st.subheader("🔍 設定検証結果")
 
@@ -388,5 +399,15 @@ def show_config_export():
     st.info("現在の設定をバックアップとして保存できます（実装中）")
 
 
+# 操作モード名 -> 表示関数（サイドバーの表示順を兼ねる）
+MODE_HANDLERS = {
+    "プロンプト一覧": show_prompt_list,
+    "プロンプト編集": show_prompt_editor,
+    "新規プロンプト作成": show_prompt_creator,
+    "プロンプトプレビュー": show_prompt_preview,
+    "設定ファイル管理": show_config_file_manager,
+}
+
+
 if __name__ == "__main__":
     show_prompt_settings()
@@ -35,6 +35,7 @@
 
 技術仕様:
     - StreamlitのタブUIによる機能分割
+    - st.fragment によるタブ単位の部分リラン
     - 動的な設定検証機能
     - リアルタイム設定反映
     - エラーハンドリング付きの安全な設定変更
@@ -56,16 +57,196 @@ import streamlit as st
 import sys
 import os
 import json
-from typing import Dict, Any
+import time
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Tuple
 
 # パスを追加
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config.settings import settings, update_session_settings
+from config.settings import TRACKED_SETTING_KEYS, settings, update_session_settings
 from utils.session_manager import SessionManager
-from utils.llm_manager import llm_manager
 
+# 単独ページとして実行された場合のみ、最初のStreamlitコマンドとしてページ設定を行う
+# （app.py から呼び出される場合は app.py 側で設定済み）
+if __name__ == "__main__":
+    st.set_page_config(page_title="設定 - Wiki Chatbot", page_icon="⚙️", layout="wide")
+
+# デバッグ表示フラグ（secrets は起動中に変わらないためモジュール読み込み時に一度だけ取得）
+try:
+    DEBUG_MODE = bool(st.secrets.get("DEBUG_MODE", False))
+except Exception:
+    DEBUG_MODE = False
+
+# タブ単位の部分リラン用デコレータ（st.fragment 非対応のStreamlitでは通常の関数として動作）
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# 遅延バックアップチェックの最短間隔（秒）
+_BACKUP_CHECK_INTERVAL_SECONDS = 30
+
+# 「設定リセット」で削除するセッションキーの接頭辞
+_RESETTABLE_PREFIXES = ("selected_model_", "selected_provider")
+
+# RAGプリセットの説明
+_PRESET_DESCRIPTIONS = MappingProxyType(
+    {
+        "general": "汎用設定 - バランスの取れた標準設定",
+        "short_docs": "短文書用 - 商品紹介、FAQ等の短い文書に最適",
+        "long_docs": "長文書用 - マニュアル、仕様書等の長い文書に最適",
+        "technical": "技術文書用 - 技術仕様、設計書等の詳細文書に最適",
+    }
+)
+
+# プロンプトスタイルの説明
+_STYLE_DESCRIPTIONS = MappingProxyType(
+    {
+        "general": "汎用 - 一般的な問い合わせに対応",
+        "business": "営業支援 - 営業担当者向けの実践的な情報提供",
+        "technical": "技術サポート - エンジニア向けの技術的な回答",
+        "compliance": "コンプライアンス - 法的・規制的観点を重視した慎重な回答",
+    }
+)
+
+# プロバイダー別API Key取得ページ
+_PROVIDER_DOC_URLS = MappingProxyType(
+    {
+        "openai": "https://platform.openai.com/api-keys",
+        "anthropic": "https://console.anthropic.com/",
+        "google": "https://ai.google.dev/",
+    }
+)
+
+
+@st.cache_resource
+def get_llm_manager():
+    """LLMマネージャーのシングルトンを取得（リラン・セッション間で共有）"""
+    from utils.llm_manager import llm_manager
+
+    return llm_manager
+
+
+@st.cache_resource
+def _prompt_manager():
+    """プロンプトマネージャーを取得（読み込み失敗時はNone）"""
+    try:
+        from utils.prompt_manager import prompt_manager
+
+        return prompt_manager
+    except Exception:
+        return None
+
+
+@st.cache_resource
+def _feedback_manager():
+    """フィードバックマネージャーを取得（読み込み失敗時はNone）"""
+    try:
+        from utils.feedback_manager import feedback_manager
+
+        return feedback_manager
+    except Exception:
+        return None
+
+
+@st.cache_data(ttl=60)
+def _cached_provider_status(current_provider: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """プロバイダー状態を取得（使用中プロバイダーごとに60秒キャッシュ）"""
+    return get_llm_manager().get_provider_status()
+
+
+@st.cache_data(ttl=60)
+def _cached_available_providers() -> Dict[str, str]:
+    """利用可能なプロバイダー一覧を取得（60秒キャッシュ）"""
+    return get_llm_manager().get_available_providers()
+
+
+@st.cache_data(ttl=60)
+def _cached_available_models(provider_id: str) -> Dict[str, str]:
+    """指定プロバイダーのモデル一覧を取得（60秒キャッシュ）"""
+    return get_llm_manager().get_available_models(provider_id)
+
+
+@st.cache_data(ttl=60)
+def _cached_model_options(provider_ids: Tuple[str, ...]) -> Dict[Tuple[str, str], str]:
+    """(プロバイダー, モデル) の組とモデル表示名の対応を取得（60秒キャッシュ）"""
+    return {
+        (provider_id, model_id): model_name
+        for provider_id in provider_ids
+        for model_id, model_name in _cached_available_models(provider_id).items()
+    }
+
+
+@st.cache_data(ttl=60)
+def _cached_model_info(current_provider: Optional[str], current_model: Optional[str]) -> Dict[str, Any]:
+    """現在のモデル情報を取得（プロバイダー・モデルの組ごとに60秒キャッシュ）"""
+    return get_llm_manager().get_model_info()
+
+
+@st.cache_data(ttl=30)
+def _all_api_keys() -> Dict[str, Optional[str]]:
+    """全プロバイダーのAPI Keyを一括取得（30秒キャッシュ）"""
+    return {provider_id: settings.get_api_key(provider_id) for provider_id in settings.LLM_PROVIDERS}
+
+
+@st.cache_data(max_entries=32, ttl=300)
+def _preview_prompt(style: str, product_name: str, company_name: str, context_text: str) -> str:
+    """プロンプトプレビューを生成（引数の組ごとにキャッシュ）"""
+    return settings.get_system_prompt(
+        style, product_name=product_name, company_name=company_name, context_text=context_text
+    )
+
+
+# 設定検証結果のキャッシュキーに使用する設定ファイル
+_SETTINGS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "settings.py")
+
+
+@st.cache_data(ttl=60)
+def _validate_settings(config_mtime: float) -> Dict[str, list]:
+    """設定を検証（設定ファイルの更新時刻ごとに60秒キャッシュ）"""
+    return settings.validate_settings()
+
+
+def _provider_state_label(status: Dict[str, Any]) -> str:
+    """プロバイダーの利用可能性を表示用ラベルに変換"""
+    if status["available"]:
+        return "🟢 利用可能"
+    if status["api_key_configured"]:
+        # パッケージはあるがプロバイダー初期化失敗 / パッケージ未インストール
+        return "🟡 設定エラー" if status.get("package_installed", False) else "🟡 未インストール"
+    return "🔴 未設定"  # API Key未設定
+
+
+def _fmt_num(value: Any, na: str = "N/A") -> str:
+    """数値は桁区切りで、それ以外は既定文字列で表示用に整形"""
+    return f"{value:,}" if isinstance(value, (int, float)) else na
 
+
+@lru_cache(maxsize=32)
+def _rag_cfg(config_name: str):
+    """RAG設定を取得（キャッシュ付き）"""
+    return settings.get_rag_config(config_name)
+
+
+@lru_cache(maxsize=32)
+def _model_cfg(provider: str, model: str):
+    """モデル設定を取得（キャッシュ付き）"""
+    return settings.get_model_config(provider, model)
+
+
+@lru_cache(maxsize=1)
+def _system_cfg():
+    """システム設定を取得（キャッシュ付き）"""
+    return settings.get_system_config()
+
+
+def _clear_config_caches() -> None:
+    """設定取得キャッシュをクリア"""
+    _rag_cfg.cache_clear()
+    _model_cfg.cache_clear()
+    _system_cfg.cache_clear()
+
+
+@_fragment
 def show_llm_settings():
     """LLM設定画面を表示する。
 
@@ -100,56 +281,39 @@ def show_llm_settings():
     """
     st.header("🤖 LLM プロバイダー設定")
 
+    llm_manager = get_llm_manager()
+    # LLMマネージャーは全セッション共有のため、current_provider を参照する前にこのセッションの設定を再反映
+    llm_manager._load_current_settings()
+
     # プロバイダー状態の表示
     col1, col2 = st.columns([2, 1])
 
     with col1:
         st.subheader("利用可能プロバイダー")
-        provider_status = llm_manager.get_provider_status()
-
-        # プロバイダーごとの状態表示（詳細な状態管理）
-        for provider_id, status in provider_status.items():
-            with st.container():
-                col_name, col_status, col_key = st.columns([2, 1, 2])
-
-                with col_name:
-                    # 状態に応じたアイコン表示
-                    icon = "✅" if status["available"] else "⚠️" if status["api_key_configured"] else "❌"
-                    current_mark = " 🔹 **使用中**" if status["current"] else ""
-                    st.write(f"{icon} **{status['name']}**{current_mark}")
-
-                with col_status:
-                    # 利用可能性の詳細状態表示
-                    if status["available"]:
-                        st.success("利用可能")
-                    elif status["api_key_configured"]:
-                        # パッケージインストール状況も表示
-                        if status.get("package_installed", False):
-                            st.warning("設定エラー")  # パッケージはあるがプロバイダー初期化失敗
-                        else:
-                            st.warning("未インストール")  # パッケージ未インストール
-                    else:
-                        st.error("未設定")  # API Key未設定
-
-                with col_key:
-                    # API Key設定状況の表示（セキュリティのため末尾4文字のみ）
-                    if status["api_key_configured"]:
-                        st.write(f"🔑 ...{status['api_key_partial']}")
-                    else:
-                        st.write("🔑 未設定")
+        provider_status = _cached_provider_status(llm_manager.current_provider)
+
+        # プロバイダーごとの状態を1つの表にまとめて表示
+        rows = ["| | プロバイダー | 状態 | API Key |", "|---|---|---|---|"]
+        for status in provider_status.values():
+            # 状態に応じたアイコン表示
+            icon = "✅" if status["available"] else "⚠️" if status["api_key_configured"] else "❌"
+            current_mark = " 🔹 **使用中**" if status["current"] else ""
+            # API Key設定状況の表示（セキュリティのため末尾4文字のみ）
+            key_text = f"🔑 ...{status['api_key_partial']}" if status["api_key_configured"] else "🔑 未設定"
+            state_label = _provider_state_label(status)
+            rows.append(f"| {icon} | **{status['name']}**{current_mark} | {state_label} | {key_text} |")
+        st.markdown("\n".join(rows))
 
     with col2:
         st.subheader("現在のモデル情報")
-        # LLMマネージャーを再初期化して最新の設定を反映
-        llm_manager._load_current_settings()
-        model_info = llm_manager.get_model_info()
+        model_info = _cached_model_info(llm_manager.current_provider, llm_manager.current_model)
 
         if model_info:
             # model_infoの'provider'キーは既に表示名が入っている
             st.write(f"**プロバイダー**: {model_info.get('provider', 'N/A')}")
             st.write(f"**モデル**: {model_info.get('model', 'N/A')}")
-            st.write(f"**最大トークン**: {model_info.get('max_tokens', 'N/A'):,}" if isinstance(model_info.get('max_tokens'), (int, float)) else f"**最大トークン**: {model_info.get('max_tokens', 'N/A')}")
-            st.write(f"**コンテキスト**: {model_info.get('context_window', 'N/A'):,}" if isinstance(model_info.get('context_window'), (int, float)) else f"**コンテキスト**: {model_info.get('context_window', 'N/A')}")
+            st.write(f"**最大トークン**: {_fmt_num(model_info.get('max_tokens'))}")
+            st.write(f"**コンテキスト**: {_fmt_num(model_info.get('context_window'))}")
             st.write(f"**入力単価**: ${model_info.get('cost_per_1k_input', 0):.4f}/1K")
             st.write(f"**出力単価**: ${model_info.get('cost_per_1k_output', 0):.4f}/1K")
 
@@ -167,64 +331,59 @@ def show_llm_settings():
     # プロバイダー・モデル選択
     st.subheader("プロバイダー・モデル選択")
 
-    available_providers = llm_manager.get_available_providers()
+    available_providers = _cached_available_providers()
     if not available_providers:
         st.error("利用可能なプロバイダーがありません。API Keyを設定してください。")
         return
 
-    col1, col2 = st.columns(2)
-
-    with col1:
-        selected_provider = st.selectbox(
-            "プロバイダーを選択",
-            options=list(available_providers.keys()),
-            format_func=lambda x: available_providers[x],
-            index=(
-                list(available_providers.keys()).index(llm_manager.current_provider)
-                if llm_manager.current_provider in available_providers
-                else 0
-            ),
-            key="provider_selector",
-        )
-
-    with col2:
-        available_models = llm_manager.get_available_models(selected_provider)
-        selected_model = st.selectbox(
-            "モデルを選択",
-            options=list(available_models.keys()),
-            format_func=lambda x: available_models[x],
-            index=(
-                list(available_models.keys()).index(llm_manager.current_model)
-                if llm_manager.current_model in available_models
-                else 0
-            ),
-            key="model_selector",
-        )
+    # プロバイダーとモデルを1つのフォームで選択し、適用時のみリランする
+    model_options = _cached_model_options(tuple(available_providers))
+    option_keys = list(model_options)
+    if not option_keys:
+        st.warning("選択可能なモデルがありません。プロバイダーの設定を確認してください。")
+        return
+    current_option = (llm_manager.current_provider, llm_manager.current_model)
+    option_idx = option_keys.index(current_option) if current_option in model_options else 0
 
-    # 設定変更ボタン
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        if st.button("設定を適用", type="primary"):
-            try:
-                llm_manager.set_current_provider(selected_provider, selected_model)
-                st.success(
-                    f"✅ {available_providers[selected_provider]} - {available_models[selected_model]} に変更しました"
-                )
-                st.rerun()
-            except Exception as e:
-                st.error(f"設定変更エラー: {str(e)}")
+        with st.form("llm_provider_form"):
+            selected_provider, selected_model = st.selectbox(
+                "プロバイダー・モデルを選択",
+                options=option_keys,
+                format_func=lambda x: f"{available_providers[x[0]]} - {model_options[x]}",
+                index=option_idx,
+                key="llm_model_selector",
+            )
+
+            if st.form_submit_button("設定を適用", type="primary"):
+                try:
+                    llm_manager.set_current_provider(selected_provider, selected_model)
+                    _cached_provider_status.clear()
+                    _cached_available_models.clear()
+                    _cached_model_options.clear()
+                    st.success(
+                        f"✅ {available_providers[selected_provider]} - "
+                        f"{model_options[(selected_provider, selected_model)]} に変更しました"
+                    )
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"設定変更エラー: {str(e)}")
 
     with col2:
         if st.button("🔄 設定リセット", help="古いモデル名などの問題を解決します"):
-            # 古いセッション状態をクリア
-            keys_to_clear = []
-            for key in st.session_state.keys():
-                if key.startswith(('selected_model_', 'selected_provider')):
-                    keys_to_clear.append(key)
-
-            for key in keys_to_clear:
-                del st.session_state[key]
+            # 古いセッション状態をクリア（追跡済みのキーのみ。未追跡の場合は全キーを走査）
+            tracked_keys = st.session_state.get(TRACKED_SETTING_KEYS)
+            if tracked_keys:
+                for key in tracked_keys:
+                    st.session_state.pop(key, None)
+                tracked_keys.clear()
+            else:
+                for key in tuple(st.session_state.keys()):
+                    if key.startswith(_RESETTABLE_PREFIXES):
+                        del st.session_state[key]
+            _clear_config_caches()
 
             st.success("✅ 設定をリセットしました。ページを再読み込みしてください。")
             st.rerun()
@@ -232,7 +391,7 @@ def show_llm_settings():
     # モデル詳細情報
     if selected_provider and selected_model:
         st.subheader("選択モデルの詳細")
-        model_config = settings.get_model_config(selected_provider, selected_model)
+        model_config = _model_cfg(selected_provider, selected_model)
 
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -246,13 +405,14 @@ def show_llm_settings():
             st.metric("Top P", model_config.top_p)
 
 
+@_fragment
 def show_rag_settings():
     """RAG設定画面"""
     st.header("🔍 RAG (検索) 設定")
 
     # 現在の設定表示
     current_rag_config_name = settings.get_default_rag_config()
-    current_rag_config = settings.get_rag_config(current_rag_config_name)
+    current_rag_config = _rag_cfg(current_rag_config_name)
 
     st.subheader("現在のRAG設定")
     col1, col2, col3 = st.columns(3)
@@ -271,34 +431,34 @@ def show_rag_settings():
     # プリセット選択
     st.subheader("RAG設定プリセット")
 
-    preset_descriptions = {
-        "general": "汎用設定 - バランスの取れた標準設定",
-        "short_docs": "短文書用 - 商品紹介、FAQ等の短い文書に最適",
-        "long_docs": "長文書用 - マニュアル、仕様書等の長い文書に最適",
-        "technical": "技術文書用 - 技術仕様、設計書等の詳細文書に最適",
-    }
+    preset_keys = list(settings.RAG_SETTINGS)
+    preset_idx = preset_keys.index(current_rag_config_name)
 
     col1, col2 = st.columns([2, 1])
 
     with col1:
         selected_preset = st.selectbox(
             "プリセットを選択",
-            options=list(settings.RAG_SETTINGS.keys()),
-            format_func=lambda x: f"{x.replace('_', ' ').title()} - {preset_descriptions[x]}",
-            index=list(settings.RAG_SETTINGS.keys()).index(current_rag_config_name),
+            options=preset_keys,
+            format_func=lambda x: f"{x.replace('_', ' ').title()} - {_PRESET_DESCRIPTIONS[x]}",
+            index=preset_idx,
             key="rag_preset_selector",
         )
 
     with col2:
         if st.button("プリセットを適用", type="primary"):
             update_session_settings(selected_rag_config=selected_preset)
+            _clear_config_caches()
             st.success(f"✅ RAG設定を '{selected_preset}' に変更しました")
             st.rerun()
 
-    # 選択中プリセットの詳細
-    if selected_preset:
+    # 選択中プリセットの詳細（現在と同じプリセットなら比較表は省略）
+    if selected_preset == current_rag_config_name:
         st.subheader("選択プリセットの詳細")
-        preset_config = settings.get_rag_config(selected_preset)
+        st.caption("現在のプリセットと同一です")
+    elif selected_preset:
+        st.subheader("選択プリセットの詳細")
+        preset_config = _rag_cfg(selected_preset)
 
         # 設定値を表形式で表示
         config_data = {
@@ -327,94 +487,90 @@ def show_rag_settings():
     with st.expander("🔧 カスタム設定 (上級者向け)", expanded=False):
         st.warning("⚠️ これらの設定を変更すると検索精度に影響する可能性があります")
 
-        col1, col2 = st.columns(2)
-        with col1:
-            custom_chunk_size = st.number_input(
-                "チャンクサイズ",
-                min_value=100,
-                max_value=4000,
-                value=current_rag_config.chunk_size,
-                step=50,
-                help="文書を分割する際の1チャンクあたりの文字数",
-            )
-
-            custom_chunk_overlap = st.number_input(
-                "チャンクオーバーラップ",
-                min_value=0,
-                max_value=custom_chunk_size // 2,
-                value=current_rag_config.chunk_overlap,
-                step=10,
-                help="隣接チャンク間で重複させる文字数",
-            )
-
-        with col2:
-            custom_top_k = st.number_input(
-                "検索結果数",
-                min_value=1,
-                max_value=20,
-                value=current_rag_config.search_top_k,
-                help="検索時に取得する関連文書の数",
-            )
+        with st.form("custom_rag_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                custom_chunk_size = st.number_input(
+                    "チャンクサイズ",
+                    min_value=100,
+                    max_value=4000,
+                    value=current_rag_config.chunk_size,
+                    step=50,
+                    help="文書を分割する際の1チャンクあたりの文字数",
+                )
 
-            custom_threshold = st.number_input(
-                "類似度閾値",
-                min_value=0.0,
-                max_value=1.0,
-                value=current_rag_config.similarity_threshold,
-                step=0.05,
-                help="検索結果に含める最低類似度",
-            )
+                # フォーム内ではチャンクサイズに連動できないため、上限は適用時に検証する
+                custom_chunk_overlap = st.number_input(
+                    "チャンクオーバーラップ",
+                    min_value=0,
+                    max_value=2000,
+                    value=current_rag_config.chunk_overlap,
+                    step=10,
+                    help="隣接チャンク間で重複させる文字数（チャンクサイズの半分まで）",
+                )
 
-        if st.button("カスタム設定を適用"):
-            # カスタム設定を一時的にセッションに保存
-            st.session_state["custom_rag_config"] = {
-                "chunk_size": custom_chunk_size,
-                "chunk_overlap": custom_chunk_overlap,
-                "search_top_k": custom_top_k,
-                "similarity_threshold": custom_threshold,
-            }
-            st.success("✅ カスタム設定を適用しました")
+            with col2:
+                custom_top_k = st.number_input(
+                    "検索結果数",
+                    min_value=1,
+                    max_value=20,
+                    value=current_rag_config.search_top_k,
+                    help="検索時に取得する関連文書の数",
+                )
 
+                custom_threshold = st.number_input(
+                    "類似度閾値",
+                    min_value=0.0,
+                    max_value=1.0,
+                    value=current_rag_config.similarity_threshold,
+                    step=0.05,
+                    help="検索結果に含める最低類似度",
+                )
 
+            if st.form_submit_button("カスタム設定を適用"):
+                if custom_chunk_overlap > custom_chunk_size // 2:
+                    st.error("チャンクオーバーラップはチャンクサイズの半分以下にしてください")
+                else:
+                    # カスタム設定を一時的にセッションに保存
+                    st.session_state["custom_rag_config"] = {
+                        "chunk_size": custom_chunk_size,
+                        "chunk_overlap": custom_chunk_overlap,
+                        "search_top_k": custom_top_k,
+                        "similarity_threshold": custom_threshold,
+                    }
+                    _clear_config_caches()
+                    st.success("✅ カスタム設定を適用しました")
+
+
+@_fragment
 def show_prompt_settings():
     """プロンプト設定画面"""
     st.header("💬 プロンプト設定")
 
     current_style = settings.get_default_prompt_style()
 
-    # プロンプトスタイル選択
-    style_descriptions = {
-        "general": "汎用 - 一般的な問い合わせに対応",
-        "business": "営業支援 - 営業担当者向けの実践的な情報提供",
-        "technical": "技術サポート - エンジニア向けの技術的な回答",
-        "compliance": "コンプライアンス - 法的・規制的観点を重視した慎重な回答",
-    }
-
     # プロンプトマネージャーから利用可能なプロンプトを取得
+    prompt_manager = _prompt_manager()
     try:
-        from utils.prompt_manager import prompt_manager
-        available_prompts = prompt_manager.get_available_prompts()
-        generic_prompts = available_prompts.get("generic", [])
-        
-        # フォールバック用にSYSTEM_PROMPTSからも取得
-        if not generic_prompts:
-            generic_prompts = list(settings.SYSTEM_PROMPTS.keys())
+        generic_prompts = prompt_manager.get_available_prompts().get("generic", []) if prompt_manager else []
     except Exception:
-        # エラー時はSYSTEM_PROMPTSを使用
+        generic_prompts = []
+
+    # フォールバック用にSYSTEM_PROMPTSからも取得
+    if not generic_prompts:
         generic_prompts = list(settings.SYSTEM_PROMPTS.keys())
 
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        # current_styleが利用可能なプロンプト一覧にない場合のデフォルト処理
-        if current_style not in generic_prompts and generic_prompts:
-            current_style = generic_prompts[0]
-            
+        # current_styleが利用可能なプロンプト一覧にない場合は先頭を選択
+        style_idx = generic_prompts.index(current_style) if current_style in generic_prompts else 0
+
         selected_style = st.selectbox(
             "プロンプトスタイルを選択",
             options=generic_prompts,
-            format_func=lambda x: style_descriptions.get(x, x),
-            index=generic_prompts.index(current_style) if current_style in generic_prompts else 0,
+            format_func=lambda x: _STYLE_DESCRIPTIONS.get(x, x),
+            index=style_idx,
             key="prompt_style_selector",
         )
 
@@ -427,7 +583,7 @@ def show_prompt_settings():
     # 選択中スタイルのプレビュー
     if selected_style:
         st.subheader("プロンプトプレビュー")
-        preview_prompt = settings.get_system_prompt(
+        preview_prompt = _preview_prompt(
             selected_style,
             product_name="商品A",
             company_name="ABC商事",
@@ -437,11 +593,12 @@ def show_prompt_settings():
         st.code(preview_prompt, language="text")
 
 
+@_fragment
 def show_system_settings():
     """システム設定画面"""
     st.header("⚙️ システム設定")
 
-    system_config = settings.get_system_config()
+    system_config = _system_cfg()
 
     col1, col2 = st.columns(2)
 
@@ -466,6 +623,7 @@ def show_system_settings():
     st.info("💡 システム設定を変更するには、`config/settings.py` ファイルを編集してください。")
 
 
+@_fragment
 def show_api_keys_setup():
     """API Key設定画面"""
     st.header("🔑 API Key 設定")
@@ -473,11 +631,12 @@ def show_api_keys_setup():
     st.warning("⚠️ API Keyは機密情報です。他者と共有しないでください。")
 
     # 各プロバイダーのAPI Key設定
+    api_keys = _all_api_keys()
     for provider_id, provider_info in settings.LLM_PROVIDERS.items():
         st.subheader(f"{provider_info['name']} API Key")
 
         env_var = provider_info["api_key_env"]
-        current_key = settings.get_api_key(provider_id)
+        current_key = api_keys[provider_id]
 
         col1, col2 = st.columns([3, 1])
 
@@ -498,12 +657,9 @@ export {env_var}="your-api-key-here"
                 )
 
         with col2:
-            if provider_id == "openai":
-                st.link_button("取得", "https://platform.openai.com/api-keys")
-            elif provider_id == "anthropic":
-                st.link_button("取得", "https://console.anthropic.com/")
-            elif provider_id == "google":
-                st.link_button("取得", "https://ai.google.dev/")
+            doc_url = _PROVIDER_DOC_URLS.get(provider_id)
+            if doc_url:
+                st.link_button("取得", doc_url)
 
 
 def main():
@@ -515,17 +671,22 @@ def main():
         if not SessionManager.authenticate_user():
             return
 
-    # 遅延バックアップのチェック（設定画面でも実行）
-    try:
-        from utils.feedback_manager import feedback_manager
-        feedback_manager._check_delayed_backup()
-    except Exception as e:
-        if st.secrets.get("DEBUG_MODE", False):
-            st.warning(f"遅延バックアップチェックエラー: {e}")
+    # 遅延バックアップのチェック（設定画面でも実行、予約がある場合のみ一定間隔で確認）
+    now = time.monotonic()
+    if (
+        "pending_backup_time" in st.session_state
+        and now - st.session_state.get("last_backup_check", 0.0) >= _BACKUP_CHECK_INTERVAL_SECONDS
+    ):
+        st.session_state["last_backup_check"] = now
+        try:
+            feedback_manager = _feedback_manager()
+            if feedback_manager:
+                feedback_manager._check_delayed_backup()
+        except Exception as e:
+            if DEBUG_MODE:
+                st.warning(f"遅延バックアップチェックエラー: {e}")
 
     """設定画面メイン"""
-    st.set_page_config(page_title="設定 - Wiki Chatbot", page_icon="⚙️", layout="wide")
-
     st.title("⚙️ システム設定")
 
     # タブで設定項目を分割
@@ -552,17 +713,13 @@ def main():
     # 設定検証
     st.divider()
     if st.button("🔍 設定を検証"):
-        issues = settings.validate_settings()
+        issues = _validate_settings(os.path.getmtime(_SETTINGS_FILE))
 
         if issues["errors"]:
-            st.error("❌ エラーが見つかりました:")
-            for error in issues["errors"]:
-                st.error(f"• {error}")
+            st.error("❌ エラーが見つかりました:\n\n" + "\n".join(f"- {error}" for error in issues["errors"]))
 
         if issues["warnings"]:
-            st.warning("⚠️ 警告:")
-            for warning in issues["warnings"]:
-                st.warning(f"• {warning}")
+            st.warning("⚠️ 警告:\n\n" + "\n".join(f"- {warning}" for warning in issues["warnings"]))
 
         if not issues["errors"] and not issues["warnings"]:
             st.success("✅ すべての設定が正常です!")
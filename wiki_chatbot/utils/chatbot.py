@@ -1,5 +1,7 @@
 import streamlit as st
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from types import MappingProxyType
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import sys
 import os
 
@@ -9,9 +11,176 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.settings import settings, get_current_rag_config
 from utils.rag_manager import RAGManager
 from utils.enhanced_rag_manager import enhanced_rag_manager
-from utils.llm_manager import llm_manager
+from utils.llm_manager import count_tokens, llm_manager
 from utils.prompt_manager import prompt_manager
 from utils.feedback_manager import feedback_manager
+from utils.semantic_cache import SemanticCache
+
+# デバッグ表示フラグ（secrets は起動中に変わらないためモジュール読み込み時に一度だけ取得）
+try:
+    DEBUG_MODE = bool(st.secrets.get("DEBUG_MODE", False))
+except Exception:
+    DEBUG_MODE = False
+
+# 部分リラン用デコレータ（st.fragment 非対応のStreamlitでは通常の関数として動作）
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# 回答本文と参考情報源ブロックの区切り
+_SOURCES_SEPARATOR = "---\n### 📚 参考にした情報源"
+
+# 参考情報源プレビューの共有辞書の上限件数（超えたら作り直す）
+_SOURCE_PREVIEW_INTERN_MAX = 500
+
+# ファイル形式に応じたアイコン
+_FILE_ICONS = MappingProxyType(
+    {"PDF": "📄", "TXT": "📝", "DOCX": "📄", "DOC": "📄", "PPTX": "📊", "PPT": "📊", "HTML": "🌐", "MD": "📝"}
+)
+
+
+@st.cache_resource
+def get_semantic_cache() -> SemanticCache:
+    """全セッション共有のセマンティッククエリキャッシュ"""
+    return SemanticCache(threshold=settings.get_system_config().semantic_cache_threshold)
+
+
+def _fmt_score(value: Any) -> str:
+    """スコアを小数4桁で表示（数値でなければ N/A）"""
+    return f"{value:.4f}" if isinstance(value, (int, float)) else "N/A"
+
+
+def _pack_context(context: List[Dict[str, Any]], token_budget: int) -> List[Dict[str, Any]]:
+    """類似度の高い順にトークン予算内へ詰め込み、元の順位で返す（最低1件は保持）"""
+    order = sorted(range(len(context)), key=lambda i: context[i].get("similarity_score", 0.0), reverse=True)
+    kept = set()
+    used = 0
+    for i in order:
+        tokens = count_tokens(context[i]["content"])
+        if kept and used + tokens > token_budget:
+            continue
+        kept.add(i)
+        used += tokens
+    return [item for i, item in enumerate(context) if i in kept]
+
+
+def _icon_for(file_name: str) -> Tuple[str, str]:
+    """ファイル名から (アイコン, 拡張子の大文字表記) を取得"""
+    extension = os.path.splitext(file_name)[1][1:].upper() or "FILE"
+    return _FILE_ICONS.get(extension, "📄"), extension
+
+
+def _format_source_entry(number: int, item: Dict[str, Any]) -> str:
+    """参考情報源1件分のMarkdownを生成"""
+    metadata = item["metadata"]
+    file_name = metadata["file_name"]
+    parts = [f"\n**{number}. {file_name}**\n"]
+
+    question = metadata.get("question", "")
+    answer = metadata.get("answer", "")
+    reference = metadata.get("reference", "")  # 参照データを取得
+
+    # Q&Aペアの場合は特別な表示
+    if metadata.get("type", "document") == "qa_pair" and question and answer:
+        parts.append(f"**Q:** {question}\n")
+        parts.append(f"**A:** {answer}\n")
+
+        # 参照データがある場合は表示
+        if reference:
+            # URLっぽい場合はリンク形式、そうでなければプレーンテキスト
+            if reference.startswith(("http://", "https://")):
+                parts.append(f"**📖 参照:** [{reference}]({reference})\n")
+            else:
+                parts.append(f"**📖 参照:** {reference}\n")
+        return "".join(parts)
+
+    # 通常の文書の場合
+    file_icon, file_extension = _icon_for(file_name)
+
+    parts.append(f"**{file_icon} ファイル形式:** {file_extension}\n")
+
+    # 類似度スコアがある場合は表示
+    similarity_score = item.get("similarity_score", 0.0)
+    if similarity_score > 0:
+        parts.append(f"**🎯 関連度:** {similarity_score * 100:.1f}%\n")
+
+    # チャンク情報がある場合は表示
+    chunk_index = metadata.get("chunk_index", "")
+    if chunk_index != "":
+        parts.append(f"**📍 文書内位置:** セクション{chunk_index + 1}\n")
+
+    content = item["content"]
+    content_preview = content[:150] + "..." if len(content) > 150 else content
+    parts.append("**📖 参照内容:**\n")
+    parts.append(f"```\n{content_preview}\n```\n")
+    return "".join(parts)
+
+
+@st.cache_data(ttl=300)
+def _build_prompt_options(product_name: str, prompt_generation: int) -> Dict[str, str]:
+    """表示名→プロンプトタイプの対応（汎用 → 製品固有の順、prompt_generation はキャッシュキー）"""
+    available_prompts = prompt_manager.get_available_prompts(product_name)
+    prompt_options = {}
+
+    # 汎用プロンプトを追加
+    for prompt_type in available_prompts.get("generic", []):
+        info = prompt_manager.get_prompt_info(prompt_type)
+        prompt_options[f"🌐 {info.get('name', prompt_type)}"] = prompt_type
+
+    # 製品固有プロンプトを追加
+    for prompt_type in available_prompts.get("product_specific", []):
+        info = prompt_manager.get_prompt_info(prompt_type, product_name)
+        prompt_options[f"🎯 {info.get('name', prompt_type)} (専用)"] = prompt_type
+
+    return prompt_options
+
+
+def _write_stream(chunks: Iterable[str]) -> str:
+    """テキスト断片を逐次表示して全文を返す（st.write_stream 非対応のStreamlitではプレースホルダーを更新）"""
+    if hasattr(st, "write_stream"):
+        result = st.write_stream(chunks)
+        return result if isinstance(result, str) else "".join(map(str, result))
+
+    placeholder = st.empty()
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        placeholder.markdown(text + "▌")
+    placeholder.markdown(text)
+    return text
+
+
+class _UncacheableSearchResult(Exception):
+    """キャッシュすべきでない検索結果（0件・基本検索へのフォールバック）を呼び出し元へ渡す"""
+
+    def __init__(self, results: List[Dict[str, Any]]):
+        super().__init__("uncacheable search result")
+        self.results = results
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_enhanced_search(
+    product_name: str,
+    query: str,
+    top_k: int,
+    data_version: int,
+    rag_config_name: str,
+    _query_vector: Optional[List[float]] = None,
+) -> List[Dict[str, Any]]:
+    """拡張RAG検索結果のキャッシュ（data_version・rag_config_name はキャッシュキー、_query_vector はキー対象外）
+
+    キャッシュは全セッション共有のため、0件や基本検索へのフォールバック結果（一時的なエラーや
+    インデックス作成中の可能性がある）は例外で返してキャッシュしない。
+    """
+    results = enhanced_rag_manager.enhanced_search(
+        product_name,
+        query,
+        top_k=top_k,
+        use_query_expansion=True,
+        use_result_ranking=True,
+        query_vector=_query_vector,
+    )
+    if not results or any("search_method" not in result.get("metadata", {}) for result in results):
+        raise _UncacheableSearchResult(results)
+    return results
 
 
 class WikiChatbot:
@@ -19,7 +188,12 @@ class WikiChatbot:
         self.rag_manager = RAGManager()
         self.enhanced_rag_manager = enhanced_rag_manager
         self.llm_manager = llm_manager
-        self.cost_tracker = {"total_cost": 0.0, "session_queries": 0}
+        self.semantic_cache = get_semantic_cache()
+
+    @property
+    def cost_tracker(self) -> Dict[str, Any]:
+        """セッション単位のコスト集計（インスタンスは全セッション共有のためセッション状態に保持）"""
+        return st.session_state.setdefault("cost_tracker", {"total_cost": 0.0, "session_queries": 0})
 
     def generate_response(self, query: str, context: List[Dict[str, Any]], product_name: str) -> str:
         # 利用可能なプロバイダーをチェック
@@ -28,140 +202,138 @@ class WikiChatbot:
             return "⚠️ 利用可能なLLMプロバイダーがありません。設定画面でAPI Keyを設定してください。"
 
         try:
-            # コンテキストを整理
-            context_text = ""
-            sources = []
-
-            # デバッグ情報表示（検索結果の関連度確認）
-            if st.secrets.get("DEBUG_MODE", False):
-                st.write("🔍 **RAG検索結果の関連度確認**")
-                for i, item in enumerate(context):
-                    similarity = item.get('similarity_score', 'N/A')
-                    distance = item.get('distance', 'N/A')
-                    st.write(f"結果{i+1}: 類似度={similarity:.4f}, 距離={distance:.4f}")
-                    st.write(f"内容: {item['content'][:100]}...")
-                    if i >= 2:  # 上位3件まで表示
-                        break
-                st.divider()
-
-            for i, item in enumerate(context, 1):
-                context_text += f"[情報源 {i}]\n{item['content']}\n\n"
-                if "metadata" in item and "file_name" in item["metadata"]:
-                    sources.append(item["metadata"]["file_name"])
-
-            # プロンプトスタイルを取得（セッション状態から）
-            prompt_style = st.session_state.get(f"prompt_style_{product_name}", settings.get_default_prompt_style())
-            system_prompt = prompt_manager.get_system_prompt(
-                prompt_style,
-                product_name=product_name,
-                company_name=settings.get_company_name(),
-                context_text=context_text,
-            )
-
-            # メッセージ形式を構築（会話履歴を含む）
-            messages = [{"role": "system", "content": system_prompt}]
-
-            # 過去の会話履歴を追加（最新5回まで）
-            chat_history = st.session_state.get(f"messages_{product_name}", [])
-            recent_history = chat_history[-10:]  # 最新5往復（10メッセージ）を取得
-
-            for msg in recent_history:
-                if msg["role"] == "user":
-                    messages.append({"role": "user", "content": msg["content"]})
-                elif msg["role"] == "assistant":
-                    # アシスタントメッセージから参考情報源部分を除去
-                    clean_content = msg["content"].split("---\n### 📚 参考にした情報源")[0].strip()
-                    messages.append({"role": "assistant", "content": clean_content})
-
-            # 現在の質問を追加
-            messages.append({"role": "user", "content": query})
-
-            # LLM APIを呼び出し
-            response_text, usage_info = self.llm_manager.generate_response(messages)
-
-            # コスト追跡
-            if "cost" in usage_info:
-                self.cost_tracker["total_cost"] += usage_info["cost"]
-                self.cost_tracker["session_queries"] += 1
-
-            # 情報源を追加（詳細版）
-            if sources:
-                unique_sources = list(set(sources))
-                source_text = "\n\n---\n### 📚 参考にした情報源\n"
+            messages, system_prefix, source_text, _ = self._prepare_generation(query, context, product_name)
+        except Exception as e:
+            return f"❌ 回答生成中にエラーが発生しました: {str(e)}"
 
-                # 各ソースファイルの詳細情報を追加
-                source_details = []
-                for i, item in enumerate(context, 1):
-                    if "metadata" in item and "file_name" in item["metadata"]:
-                        file_name = item["metadata"]["file_name"]
-                        metadata = item["metadata"]
+        return "".join(self._stream_and_accumulate(messages, system_prefix)) + source_text
 
-                        # 重複チェック
-                        if file_name not in [detail["file"] for detail in source_details]:
-                            detail = {
-                                "file": file_name,
-                                "content_preview": (
-                                    item["content"][:150] + "..." if len(item["content"]) > 150 else item["content"]
-                                ),
-                                "reference": metadata.get("reference", ""),  # 参照データを取得
-                                "type": metadata.get("type", "document"),
-                                "question": metadata.get("question", ""),
-                                "answer": metadata.get("answer", ""),
-                                "chunk_index": metadata.get("chunk_index", ""),
-                                "similarity_score": item.get("similarity_score", 0.0),
-                            }
-                            source_details.append(detail)
-
-                # ソース情報をフォーマット
-                for i, detail in enumerate(source_details, 1):
-                    source_text += f"\n**{i}. {detail['file']}**\n"
-
-                    # Q&Aペアの場合は特別な表示
-                    if detail['type'] == 'qa_pair' and detail['question'] and detail['answer']:
-                        source_text += f"**Q:** {detail['question']}\n"
-                        source_text += f"**A:** {detail['answer']}\n"
-
-                        # 参照データがある場合は表示
-                        if detail['reference']:
-                            # URLっぽい場合はリンク形式、そうでなければプレーンテキスト
-                            if detail['reference'].startswith(('http://', 'https://')):
-                                source_text += f"**📖 参照:** [{detail['reference']}]({detail['reference']})\n"
-                            else:
-                                source_text += f"**📖 参照:** {detail['reference']}\n"
-                    else:
-                        # 通常の文書の場合
-                        file_name = detail['file']
-                        file_extension = file_name.split('.')[-1].upper() if '.' in file_name else 'FILE'
+    def _stream_response(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        product_name: str,
+        stream_state: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """回答をトークン単位で逐次表示し、情報源を付加した全文を返す
 
-                        # ファイル形式に応じたアイコン
-                        file_icon = {
-                            'PDF': '📄', 'TXT': '📝', 'DOCX': '📄', 'DOC': '📄',
-                            'PPTX': '📊', 'PPT': '📊', 'HTML': '🌐', 'MD': '📝'
-                        }.get(file_extension, '📄')
+        stream_state には実際にLLMへ渡したコンテキスト（"context"）と失敗の有無（"failed"）を格納します。
+        """
+        stream_state = stream_state if stream_state is not None else {}
+        available_providers = self.llm_manager.get_available_providers()
+        if not available_providers:
+            stream_state["failed"] = True
+            response = "⚠️ 利用可能なLLMプロバイダーがありません。設定画面でAPI Keyを設定してください。"
+            st.markdown(response)
+            return response
 
-                        source_text += f"**{file_icon} ファイル形式:** {file_extension}\n"
+        try:
+            messages, system_prefix, source_text, stream_state["context"] = self._prepare_generation(
+                query, context, product_name
+            )
+        except Exception as e:
+            stream_state["failed"] = True
+            response = f"❌ 回答生成中にエラーが発生しました: {str(e)}"
+            st.markdown(response)
+            return response
+
+        response_text = _write_stream(self._stream_and_accumulate(messages, system_prefix, stream_state))
+        if source_text:
+            st.markdown(source_text)
+        return response_text + source_text
+
+    def _stream_and_accumulate(
+        self,
+        messages: List[Dict[str, str]],
+        system_prefix: str = "",
+        stream_state: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[str]:
+        """LLMの出力断片を順次返し、完了後にコストを集計（途中で失敗した場合は stream_state["failed"] を設定）"""
+        usage_info: Dict[str, Any] = {}
+        try:
+            yield from self.llm_manager.stream_response(messages, usage=usage_info, system_prefix=system_prefix)
+        except Exception as e:
+            if stream_state is not None:
+                stream_state["failed"] = True
+            yield f"❌ 回答生成中にエラーが発生しました: {str(e)}"
+            return
 
-                        # 類似度スコアがある場合は表示
-                        if detail.get('similarity_score', 0) > 0:
-                            similarity_percent = detail['similarity_score'] * 100
-                            source_text += f"**🎯 関連度:** {similarity_percent:.1f}%\n"
+        # コスト追跡
+        if "cost" in usage_info:
+            self.cost_tracker["total_cost"] += usage_info["cost"]
+            self.cost_tracker["session_queries"] += 1
+
+        # 使用情報をサイドバーに表示
+        self._display_usage_info(usage_info)
+
+    def _prepare_generation(
+        self, query: str, context: List[Dict[str, Any]], product_name: str
+    ) -> Tuple[List[Dict[str, str]], str, str, List[Dict[str, Any]]]:
+        """LLMに渡すメッセージ、システムプロンプトの静的プレフィックス、回答末尾の情報源ブロック、予算内に絞り込んだコンテキストを構築"""
+        # 長いコンテキストによるプレフィル遅延を抑えるため、トークン予算内に絞り込む
+        _, rag_config = get_current_rag_config()
+        context = _pack_context(context, rag_config.context_token_budget)
+
+        # デバッグ情報表示（検索結果の関連度確認）
+        if DEBUG_MODE:
+            st.write("🔍 **RAG検索結果の関連度確認**")
+            top_items = context[:3]  # 上位3件まで表示
+            st.table(
+                {
+                    "結果": [f"結果{i}" for i in range(1, len(top_items) + 1)],
+                    "類似度": [_fmt_score(item.get("similarity_score")) for item in top_items],
+                    "距離": [_fmt_score(item.get("distance")) for item in top_items],
+                    "内容": [f"{item['content'][:100]}..." for item in top_items],
+                }
+            )
+            st.divider()
+
+        # コンテキストと情報源ブロックを1回の走査で構築
+        context_parts = []
+        source_parts = []
+        seen_files = set()
+        for i, item in enumerate(context, 1):
+            context_parts.append(f"[情報源 {i}]\n{item['content']}\n\n")
+            metadata = item.get("metadata") or {}
+            if "file_name" not in metadata or metadata["file_name"] in seen_files:
+                continue
+            seen_files.add(metadata["file_name"])
+            source_parts.append(_format_source_entry(len(seen_files), item))
+        context_text = "".join(context_parts)
+
+        # プロンプトスタイルを取得（セッション状態から）
+        prompt_style = st.session_state.get(f"prompt_style_{product_name}", settings.get_default_prompt_style())
+        system_prefix, system_suffix = prompt_manager.get_system_prompt_parts(
+            prompt_style,
+            product_name=product_name,
+            company_name=settings.get_company_name(),
+            context_text=context_text,
+        )
 
-                        # チャンク情報がある場合は表示
-                        if detail.get('chunk_index', '') != '':
-                            source_text += f"**📍 文書内位置:** セクション{detail['chunk_index'] + 1}\n"
+        # メッセージ形式を構築（会話履歴を含む）
+        messages = [{"role": "system", "content": system_prefix + system_suffix}]
 
-                        source_text += f"**📖 参照内容:**\n"
-                        source_text += f"```\n{detail['content_preview']}\n```\n"
+        # 過去の会話履歴を追加（最新5回まで）
+        chat_history = st.session_state.get(f"messages_{product_name}", [])
+        recent_history = chat_history[-10:]  # 最新5往復（10メッセージ）を取得
 
-                response_text += source_text
+        for msg in recent_history:
+            if msg["role"] == "user":
+                messages.append({"role": "user", "content": msg["content"]})
+            elif msg["role"] == "assistant":
+                # 参考情報源部分を除去済みの本文（保存時に計算）を使用
+                clean_content = msg.get("clean_content")
+                if clean_content is None:
+                    clean_content = msg["content"].split(_SOURCES_SEPARATOR)[0].strip()
+                messages.append({"role": "assistant", "content": clean_content})
 
-            # 使用情報をサイドバーに表示
-            self._display_usage_info(usage_info)
+        # 現在の質問を追加
+        messages.append({"role": "user", "content": query})
 
-            return response_text
+        # 情報源を追加（詳細版）
+        source_text = "\n\n---\n### 📚 参考にした情報源\n" + "".join(source_parts) if source_parts else ""
 
-        except Exception as e:
-            return f"❌ 回答生成中にエラーが発生しました: {str(e)}"
+        return messages, system_prefix, source_text, context
 
     def chat_interface(self, product_name: str):
         st.title(f"💬 {product_name} Wiki チャット")
@@ -172,12 +344,14 @@ class WikiChatbot:
         # プロンプトスタイル選択UI
         self._show_prompt_style_selector(product_name)
 
-        # チャット履歴の初期化
-        if f"messages_{product_name}" not in st.session_state:
-            st.session_state[f"messages_{product_name}"] = []
+        # チャット履歴の初期化（以降はこのリストを直接参照）
+        messages = st.session_state.setdefault(f"messages_{product_name}", [])
+
+        # 現在のプロンプトスタイルを取得（選択UIの反映後に一度だけ）
+        prompt_style = st.session_state.get(f"prompt_style_{product_name}", settings.get_default_prompt_style())
 
         # チャット履歴の表示
-        for i, message in enumerate(st.session_state[f"messages_{product_name}"]):
+        for i, message in enumerate(messages):
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
 
@@ -192,7 +366,7 @@ class WikiChatbot:
                                 st.divider()
 
         # 会話継続のヒント表示
-        if len(st.session_state[f"messages_{product_name}"]) > 0:
+        if messages:
             st.info(
                 "💡 **追加質問のコツ**: 「先ほどの回答について詳しく教えて」「他に何かありますか」など、前の会話を踏まえた質問もできます。"
             )
@@ -200,132 +374,180 @@ class WikiChatbot:
         # ユーザー入力
         if prompt := st.chat_input(f"{product_name}について何でもお聞きください（追加質問も可能）"):
             # ユーザーメッセージを追加
-            st.session_state[f"messages_{product_name}"].append({"role": "user", "content": prompt})
+            messages.append({"role": "user", "content": prompt})
 
             with st.chat_message("user"):
                 st.markdown(prompt)
 
+            # LLMマネージャーは全セッション共有のため、このセッションで選択したプロバイダー・モデルを反映
+            self.llm_manager._load_current_settings()
+
             # アシスタントの回答を生成
             with st.chat_message("assistant"):
-                with st.spinner("回答を生成中..."):
-                    # 拡張RAG検索を使用
-                    try:
-                        search_results = self.enhanced_rag_manager.enhanced_search(
-                            product_name, prompt, top_k=5, use_query_expansion=True, use_result_ranking=True
-                        )
-                    except Exception as e:
-                        # フォールバックで基本RAGを使用
-                        st.warning("拡張RAG機能でエラーが発生しました。基本機能を使用します。")
-                        search_results = self.rag_manager.search(product_name, prompt, top_k=5)
-
-                    if not search_results:
-                        response = f"申し訳ございませんが、{product_name}に関する情報が見つかりませんでした。管理画面から関連文書を追加してください。"
+                with st.spinner("関連情報を検索中..."):
+                    # 会話の最初の質問のみセマンティックキャッシュを利用（追加質問は履歴に依存するため対象外）
+                    # 回答内容を左右する設定（モデル・プロンプト・検索設定・会社名）をすべてスコープに含める
+                    cache_scope = (
+                        product_name,
+                        prompt_style,
+                        RAGManager.data_version,
+                        self.llm_manager.current_provider,
+                        self.llm_manager.current_model,
+                        prompt_manager.generation,
+                        settings.get_default_rag_config(),
+                        settings.get_company_name(),
+                    )
+                    query_vector = None
+                    cached = None
+                    if len(messages) == 1:
+                        query_vector = self.enhanced_rag_manager.embed_query(prompt)
+                        if query_vector is not None:
+                            cached = self.semantic_cache.get(query_vector, cache_scope)
+
+                    if cached is not None:
+                        search_results, response = cached
                     else:
-                        # 回答生成
-                        response = self.generate_response(prompt, search_results, product_name)
-
+                        # 拡張RAG検索を使用
+                        try:
+                            search_results = _cached_enhanced_search(
+                                product_name,
+                                prompt,
+                                5,
+                                RAGManager.data_version,
+                                settings.get_default_rag_config(),
+                                query_vector,
+                            )
+                        except _UncacheableSearchResult as uncached:
+                            search_results = uncached.results
+                        except Exception as e:
+                            # フォールバックで基本RAGを使用
+                            st.warning("拡張RAG機能でエラーが発生しました。基本機能を使用します。")
+                            search_results = self.rag_manager.search(product_name, prompt, top_k=5)
+
+                # 回答の参考情報源（生成時はLLMへ実際に渡したコンテキストに置き換える）
+                used_results = search_results
+
+                if cached is not None:
+                    st.caption("⚡ 類似の質問に対する回答を再利用しました")
                     st.markdown(response)
-
-                    # 参考ファイル詳細の表示
-                    if search_results:
-                        with st.expander("📋 参考ファイルの詳細を確認", expanded=False):
-                            st.subheader("🔍 検索結果と参考ファイル")
-
-                            # ファイルごとにグループ化
-                            files_grouped = {}
-                            for i, result in enumerate(search_results, 1):
-                                file_name = result.get("metadata", {}).get("file_name", f"不明なファイル{i}")
-                                if file_name not in files_grouped:
-                                    files_grouped[file_name] = []
-                                files_grouped[file_name].append(
-                                    {
-                                        "index": i,
-                                        "content": result["content"],
-                                        "score": result.get("distance", "N/A"),
-                                        "metadata": result.get("metadata", {}),
-                                    }
-                                )
-
-                            # ファイルごとに表示
-                            for file_name, results in files_grouped.items():
-                                with st.expander(f"📄 {file_name} ({len(results)}箇所)"):
-                                    for result in results:
-                                        st.markdown(
-                                            f"**検索結果 {result['index']} (関連度スコア: {result['score']:.3f})**"
-                                        )
-                                        st.text_area(
-                                            "内容:",
-                                            result["content"],
-                                            height=100,
-                                            key=f"content_{result['index']}_{file_name}",
-                                            disabled=True,
-                                        )
-
-                                        # メタデータがある場合は表示
-                                        if result["metadata"]:
-                                            with st.expander("📊 詳細情報", expanded=False):
-                                                col1, col2 = st.columns(2)
-
-                                                with col1:
-                                                    st.write("**ファイル情報:**")
-                                                    if "file_name" in result["metadata"]:
-                                                        st.write(f"• ファイル名: {result['metadata']['file_name']}")
-                                                    if "file_size" in result["metadata"]:
-                                                        st.write(
-                                                            f"• ファイルサイズ: {result['metadata']['file_size']}"
-                                                        )
-                                                    if "created_at" in result["metadata"]:
-                                                        st.write(f"• 作成日時: {result['metadata']['created_at']}")
-
-                                                with col2:
-                                                    st.write("**検索情報:**")
-                                                    if "original_query" in result["metadata"]:
-                                                        st.write(f"• 元の質問: {result['metadata']['original_query']}")
-                                                    if "expanded_query" in result["metadata"]:
-                                                        st.write(
-                                                            f"• 拡張クエリ: {result['metadata']['expanded_query']}"
-                                                        )
-                                                    if "search_method" in result["metadata"]:
-                                                        st.write(f"• 検索方法: {result['metadata']['search_method']}")
-
-                                                # その他のメタデータ
-                                                other_metadata = {
-                                                    k: v
-                                                    for k, v in result["metadata"].items()
-                                                    if k
-                                                    not in [
-                                                        "file_name",
-                                                        "file_size",
-                                                        "created_at",
-                                                        "original_query",
-                                                        "expanded_query",
-                                                        "search_method",
-                                                    ]
-                                                }
-                                                if other_metadata:
-                                                    st.write("**その他の情報:**")
-                                                    for key, value in other_metadata.items():
-                                                        st.write(f"• {key}: {value}")
-                                        st.divider()
+                elif not search_results:
+                    response = f"申し訳ございませんが、{product_name}に関する情報が見つかりませんでした。管理画面から関連文書を追加してください。"
+                    st.markdown(response)
+                else:
+                    # 回答生成（トークン単位で逐次表示、生成に失敗した回答はキャッシュしない）
+                    stream_state: Dict[str, Any] = {}
+                    response = self._stream_response(prompt, search_results, product_name, stream_state)
+                    # トークン予算内でLLMに渡したコンテキストのみを参考情報源として記録
+                    used_results = stream_state.get("context", search_results)
+                    if query_vector is not None and not stream_state.get("failed"):
+                        self.semantic_cache.put(query_vector, cache_scope, (used_results, response))
+
+                # 参考ファイル詳細の表示
+                if search_results:
+                    with st.expander("📋 参考ファイルの詳細を確認", expanded=False):
+                        st.subheader("🔍 検索結果と参考ファイル")
+
+                        # ファイルごとにグループ化
+                        files_grouped = defaultdict(list)
+                        for i, result in enumerate(search_results, 1):
+                            file_name = result.get("metadata", {}).get("file_name", f"不明なファイル{i}")
+                            files_grouped[file_name].append(
+                                {
+                                    "index": i,
+                                    "content": result["content"],
+                                    "score": result.get("distance", "N/A"),
+                                    "metadata": result.get("metadata", {}),
+                                }
+                            )
+
+                        # ファイルごとに表示
+                        for file_name, results in files_grouped.items():
+                            with st.expander(f"📄 {file_name} ({len(results)}箇所)"):
+                                for result in results:
+                                    st.markdown(
+                                        f"**検索結果 {result['index']} (関連度スコア: {result['score']:.3f})**"
+                                    )
+                                    st.caption("内容:")
+                                    st.code(result["content"], language=None)
+
+                                    # メタデータがある場合は表示
+                                    if result["metadata"]:
+                                        with st.expander("📊 詳細情報", expanded=False):
+                                            col1, col2 = st.columns(2)
+
+                                            with col1:
+                                                st.write("**ファイル情報:**")
+                                                if "file_name" in result["metadata"]:
+                                                    st.write(f"• ファイル名: {result['metadata']['file_name']}")
+                                                if "file_size" in result["metadata"]:
+                                                    st.write(
+                                                        f"• ファイルサイズ: {result['metadata']['file_size']}"
+                                                    )
+                                                if "created_at" in result["metadata"]:
+                                                    st.write(f"• 作成日時: {result['metadata']['created_at']}")
+
+                                            with col2:
+                                                st.write("**検索情報:**")
+                                                if "original_query" in result["metadata"]:
+                                                    st.write(f"• 元の質問: {result['metadata']['original_query']}")
+                                                if "expanded_query" in result["metadata"]:
+                                                    st.write(
+                                                        f"• 拡張クエリ: {result['metadata']['expanded_query']}"
+                                                    )
+                                                if "search_method" in result["metadata"]:
+                                                    st.write(f"• 検索方法: {result['metadata']['search_method']}")
+
+                                            # その他のメタデータ
+                                            other_metadata = {
+                                                k: v
+                                                for k, v in result["metadata"].items()
+                                                if k
+                                                not in [
+                                                    "file_name",
+                                                    "file_size",
+                                                    "created_at",
+                                                    "original_query",
+                                                    "expanded_query",
+                                                    "search_method",
+                                                ]
+                                            }
+                                            if other_metadata:
+                                                st.write("**その他の情報:**")
+                                                for key, value in other_metadata.items():
+                                                    st.write(f"• {key}: {value}")
+                                    st.divider()
 
             # アシスタントメッセージを追加（参考ファイル情報も保存）
-            message_data = {"role": "assistant", "content": response}
+            message_data = {
+                "role": "assistant",
+                "content": response,
+                "clean_content": response.split(_SOURCES_SEPARATOR)[0].strip(),
+            }
 
             # 検索結果情報を保存（後から参照用）
-            if search_results:
+            unique_sources = []  # 参考ファイル名（検索順・重複なし）
+            if used_results:
                 source_files = []
-                for result in search_results:
+                seen_files = set()
+                # 同じプレビュー文字列は全メッセージで1つのオブジェクトを共有（同じ箇所が繰り返し参照されるため）
+                preview_intern = st.session_state.setdefault("_source_preview_intern", {})
+                if len(preview_intern) > _SOURCE_PREVIEW_INTERN_MAX:
+                    preview_intern.clear()
+                for result in used_results:
                     if "metadata" in result and "file_name" in result["metadata"]:
+                        preview = (
+                            result["content"][:100] + "..." if len(result["content"]) > 100 else result["content"]
+                        )
                         source_info = {
                             "file_name": result["metadata"]["file_name"],
                             "score": result.get("distance", "N/A"),
-                            "preview": (
-                                result["content"][:100] + "..." if len(result["content"]) > 100 else result["content"]
-                            ),
+                            "preview": preview_intern.setdefault(preview, preview),
                         }
                         # 重複チェック
-                        if not any(sf["file_name"] == source_info["file_name"] for sf in source_files):
+                        if source_info["file_name"] not in seen_files:
+                            seen_files.add(source_info["file_name"])
                             source_files.append(source_info)
+                            unique_sources.append(source_info["file_name"])
 
                 message_data["source_files"] = source_files
                 message_data["search_metadata"] = {
@@ -334,36 +556,21 @@ class WikiChatbot:
                     "search_method": "enhanced_rag",
                 }
 
-            st.session_state[f"messages_{product_name}"].append(message_data)
+            messages.append(message_data)
 
             # チャット履歴をCSVに保存
-            sources_list = []
-            if search_results:
-                for result in search_results:
-                    if "metadata" in result and "file_name" in result["metadata"]:
-                        sources_list.append(result["metadata"]["file_name"])
-
-            # 現在のプロンプトスタイルを取得
-            current_prompt_style = st.session_state.get(
-                f"prompt_style_{product_name}", settings.get_default_prompt_style()
-            )
-
-            # チャット履歴を保存
-            user_name = self._get_current_user_info()
             feedback_manager.save_chat_message(
                 product_name=product_name,
                 user_message=prompt,
                 bot_response=response,
-                sources_used=list(set(sources_list)),  # 重複除去
-                prompt_style=current_prompt_style,
+                sources_used=unique_sources,
+                prompt_style=prompt_style,
                 user_name=user_name,
+                background=True,  # 書き込みを待たずに次の入力を受け付ける
             )
 
         # 満足度調査を表示（会話がある程度進んだ場合）
-        current_prompt_style = st.session_state.get(
-            f"prompt_style_{product_name}", settings.get_default_prompt_style()
-        )
-        feedback_manager.show_satisfaction_survey(product_name, current_prompt_style)
+        feedback_manager.show_satisfaction_survey(product_name, prompt_style)
 
     def product_selection_interface(self):
         st.title("🏢 社内Wiki検索チャットボット")
@@ -402,6 +609,7 @@ class WikiChatbot:
                     # セッション関連の状態もクリア
                     if f"feedback_given_{product_name}" in st.session_state:
                         del st.session_state[f"feedback_given_{product_name}"]
+                    st.session_state.pop("_source_preview_intern", None)
                     st.success("✅ チャット履歴をクリアしました\n💡 次回からは新しい会話として開始されます")
                     st.rerun()
 
@@ -461,31 +669,13 @@ class WikiChatbot:
         if st.sidebar.button("🔧 設定を変更"):
             st.session_state["show_settings"] = True
 
+    @_fragment
     def _show_prompt_style_selector(self, product_name: str):
-        """プロンプトスタイル選択UI"""
-
-        # 利用可能なプロンプトを取得
-        available_prompts = prompt_manager.get_available_prompts(product_name)
-
-        # 製品固有 + 汎用プロンプトを統合
-        all_prompts = []
-        prompt_options = {}
-
-        # 汎用プロンプトを追加
-        if "generic" in available_prompts:
-            for prompt_type in available_prompts["generic"]:
-                info = prompt_manager.get_prompt_info(prompt_type)
-                display_name = f"🌐 {info.get('name', prompt_type)}"
-                all_prompts.append(display_name)
-                prompt_options[display_name] = prompt_type
-
-        # 製品固有プロンプトを追加
-        if "product_specific" in available_prompts:
-            for prompt_type in available_prompts["product_specific"]:
-                info = prompt_manager.get_prompt_info(prompt_type, product_name)
-                display_name = f"🎯 {info.get('name', prompt_type)} (専用)"
-                all_prompts.append(display_name)
-                prompt_options[display_name] = prompt_type
+        """プロンプトスタイル選択UI（操作時はこの部分のみ再実行し、チャット履歴を再描画しない）"""
+
+        # 製品固有 + 汎用プロンプトを統合（プロンプト再読み込みまでキャッシュ）
+        prompt_options = _build_prompt_options(product_name, prompt_manager.generation)
+        all_prompts = list(prompt_options)
 
         if not all_prompts:
             st.warning("利用可能なプロンプトがありません")
@@ -595,3 +785,9 @@ class WikiChatbot:
                 return user_email
         # 認証されていない場合は空文字列
         return ""
+
+
+@st.cache_resource
+def get_chatbot() -> WikiChatbot:
+    """全セッション共有のチャットボット（RAGManager等の初期化を再実行ごとに行わない）"""
+    return WikiChatbot()
@@ -65,9 +65,48 @@
 """
 
 from typing import List, Dict, Any, Optional, Tuple
+import copy
 import logging
+import re
+from types import MappingProxyType
+import numpy as np
+from config.settings import settings
 from utils.rag_manager import RAGManager
 from utils.prompt_manager import prompt_manager
+from utils.semantic_cache import SemanticCache
+
+# 同義語・関連語の簡易マッピング（クエリ拡張用）
+_SYNONYMS = MappingProxyType(
+    {
+        "価格": ("料金", "コスト", "費用"),
+        "機能": ("性能", "仕様", "特徴"),
+        "問題": ("エラー", "不具合", "トラブル"),
+        "設定": ("構成", "配置", "セットアップ"),
+        "使い方": ("操作方法", "手順", "使用法"),
+    }
+)
+# 全キーを1パスで走査するための事前コンパイル済みパターン（長いキーを優先）
+_SYNONYM_PATTERN = re.compile("|".join(map(re.escape, sorted(_SYNONYMS, key=len, reverse=True))))
+
+# 回答中の数値検出用（\d はUnicodeの10進数字に一致するため全角数字も対象）
+_DIGIT_PATTERN = re.compile(r"\d")
+
+# フォールバック応答（情報が見つからない場合の定型文）
+_FALLBACK_TEMPLATE = """申し訳ございませんが、{product_name}に関する「{query}」について、
+十分な情報を見つけることができませんでした。
+
+以下をお試しください：
+1. 異なるキーワードで再度検索
+2. より具体的な質問内容に変更
+3. 管理画面から関連資料の追加
+4. 担当部署への直接問い合わせ
+
+ご不便をおかけして申し訳ありません。"""
+
+# ランキング前の重複除外設定（先頭何文字を比較するか・シングル長・Jaccard係数の閾値）
+_DEDUP_PREFIX_CHARS = 2000
+_DEDUP_SHINGLE_SIZE = 5
+_DEDUP_JACCARD_THRESHOLD = 0.9
 
 
 class EnhancedRAGManager(RAGManager):
@@ -118,6 +157,9 @@ class EnhancedRAGManager(RAGManager):
         """
         super().__init__()                              # 基本RAGManagerの初期化
         self.logger = logging.getLogger(__name__)       # 拡張機能用ログ初期化
+        self.search_cache = SemanticCache(              # 類似クエリの検索結果キャッシュ
+            threshold=settings.get_system_config().semantic_cache_threshold, max_entries=512
+        )
 
     def enhanced_search(
         self,
@@ -126,6 +168,7 @@ class EnhancedRAGManager(RAGManager):
         top_k: int = 5,
         use_query_expansion: bool = True,
         use_result_ranking: bool = True,
+        query_vector: Optional[List[float]] = None,
     ) -> List[Dict[str, Any]]:
         """拡張検索機能を実行する。
 
@@ -138,6 +181,7 @@ class EnhancedRAGManager(RAGManager):
             top_k: 取得する検索結果の上限数（デフォルト: 5）
             use_query_expansion: クエリ拡張機能を使用するか（デフォルト: True）
             use_result_ranking: 結果再ランキング機能を使用するか（デフォルト: True）
+            query_vector: 呼び出し元で計算済みのクエリ埋め込み（指定時のみ検索キャッシュを使用）
 
         Returns:
             検索結果のリスト。各要素は以下のキーを含む辞書:
@@ -168,6 +212,23 @@ class EnhancedRAGManager(RAGManager):
             パフォーマンスを重視する場合は拡張機能を選択的に無効化できます。
         """
         try:
+            # 0. セマンティックキャッシュ照会（言い換えを含むほぼ同一の質問は検索処理を省略）
+            # 埋め込みは呼び出し元で計算済みのものを使い、ここで再計算はしない
+            # 類似度閾値はRAG設定に依存するため、設定名もキャッシュキーに含める
+            cache_scope = (
+                product_name,
+                top_k,
+                use_query_expansion,
+                use_result_ranking,
+                RAGManager.data_version,
+                settings.get_default_rag_config(),
+            )
+            if query_vector is not None:
+                cached = self.search_cache.get(query_vector, cache_scope)
+                if cached is not None:
+                    self.logger.info(f"検索キャッシュヒット: product='{product_name}', query='{query}'")
+                    return self._clone_cached_results(cached, query)
+
             # 1. クエリ拡張処理（意図理解と同義語展開）
             if use_query_expansion:
                 expanded_query = self._expand_query(product_name, query)
@@ -198,6 +259,9 @@ class EnhancedRAGManager(RAGManager):
                 result["metadata"]["expanded_query"] = expanded_query
                 result["metadata"]["search_method"] = "enhanced" if use_result_ranking else "basic"
 
+            if query_vector is not None:
+                self.search_cache.put(query_vector, cache_scope, copy.deepcopy(final_results))
+
             return final_results
 
         except Exception as e:
@@ -205,14 +269,20 @@ class EnhancedRAGManager(RAGManager):
             # フォールバックで基本検索を実行
             return self.search(product_name, query, top_k)
 
+    @staticmethod
+    def _clone_cached_results(cached: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+        """キャッシュ済み結果を複製し、メタデータの元クエリを今回の質問に差し替える"""
+        results = copy.deepcopy(cached)
+        for result in results:
+            result.setdefault("metadata", {})["original_query"] = query
+        return results
+
     def _expand_query(self, product_name: str, query: str) -> str:
         """クエリ拡張機能"""
         try:
-            # プロンプトマネージャーからクエリ拡張プロンプトを取得
-            system_prompt = prompt_manager.get_rag_prompt("query_expansion", "generic", "system_prompt")
-            user_prompt = prompt_manager.get_rag_prompt(
-                "query_expansion", "generic", "user_prompt", query=query, product_name=product_name
-            )
+            # クエリ拡張プロンプトが定義されているか確認（LLM未使用のため変数置換は不要）
+            system_prompt = prompt_manager.get_rag_prompt_template("query_expansion", "generic", "system_prompt")
+            user_prompt = prompt_manager.get_rag_prompt_template("query_expansion", "generic", "user_prompt")
 
             if not system_prompt or not user_prompt:
                 return query
@@ -228,85 +298,81 @@ class EnhancedRAGManager(RAGManager):
 
     def _simple_query_expansion(self, query: str) -> str:
         """簡易クエリ拡張（LLMを使わない版）"""
-        # 同義語・関連語の簡易マッピング
-        synonyms = {
-            "価格": ["料金", "コスト", "費用"],
-            "機能": ["性能", "仕様", "特徴"],
-            "問題": ["エラー", "不具合", "トラブル"],
-            "設定": ["構成", "配置", "セットアップ"],
-            "使い方": ["操作方法", "手順", "使用法"],
-        }
-
-        additional_terms = []
-        for word, related in synonyms.items():
-            if word in query:
-                additional_terms.extend(related)
-
-        return " ".join(additional_terms)
+        hits = set(_SYNONYM_PATTERN.findall(query))
+        if not hits:
+            return ""
+
+        # マッピングの定義順で関連語を展開
+        return " ".join(term for word, related in _SYNONYMS.items() if word in hits for term in related)
 
     def _rank_results(self, product_name: str, query: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """検索結果のランキング"""
         try:
-            # プロンプトマネージャーからランキングプロンプトを取得
-            system_prompt = prompt_manager.get_rag_prompt("result_ranking", "generic", "system_prompt")
+            # ランキングプロンプトが定義されているか確認
+            system_prompt = prompt_manager.get_rag_prompt_template("result_ranking", "generic", "system_prompt")
 
             if not system_prompt:
                 return results
 
+            # 重複チャンクを除外してからスコアリング
+            results = self._drop_near_duplicates(results)
+
             # 簡易スコアリング（実際の実装ではLLMを使用）
-            scored_results = []
-            for result in results:
-                score = self._calculate_relevance_score(query, result)
+            scores = self._score_results(query, results)
+            for result, score in zip(results, scores.tolist()):
                 result["relevance_score"] = score
-                scored_results.append(result)
 
-            # スコア順でソート
-            return sorted(scored_results, key=lambda x: x.get("relevance_score", 0), reverse=True)
+            # スコア順でソート（同点は元の順序を維持）
+            return [results[i] for i in np.argsort(-scores, kind="stable")]
 
         except Exception as e:
             self.logger.warning(f"結果ランキング失敗: {str(e)}")
             return results
 
+    @staticmethod
+    def _drop_near_duplicates(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """ほぼ同一内容の検索結果を除外（5文字シングルのJaccard係数で判定、距離の近い先頭側を残す）"""
+        kept: List[Dict[str, Any]] = []
+        kept_shingles: List[frozenset] = []
+        for result in results:
+            text = result.get("content", "")[:_DEDUP_PREFIX_CHARS]
+            last_start = max(len(text) - _DEDUP_SHINGLE_SIZE + 1, 1)
+            shingles = frozenset(text[i : i + _DEDUP_SHINGLE_SIZE] for i in range(last_start))
+            if any(
+                len(shingles & other) >= _DEDUP_JACCARD_THRESHOLD * len(shingles | other) for other in kept_shingles
+            ):
+                continue
+            kept.append(result)
+            kept_shingles.append(shingles)
+        return kept
+
     def _calculate_relevance_score(self, query: str, result: Dict[str, Any]) -> float:
         """関連度スコア計算（簡易版）"""
-        content = result.get("content", "").lower()
-        query_lower = query.lower()
-
-        # 単純なキーワードマッチング基準
-        score = 0.0
+        return float(self._score_results(query, [result])[0])
 
-        # 完全一致ボーナス
-        if query_lower in content:
-            score += 10.0
+    @staticmethod
+    def _score_results(query: str, results: List[Dict[str, Any]]) -> np.ndarray:
+        """全候補の関連度スコアを一括計算（クエリの小文字化・分割は1回のみ）"""
+        contents = [result.get("content", "").lower() for result in results]
+        query_lower = query.lower()
+        query_words = [word for word in query_lower.split() if len(word) > 2]
+        count = len(contents)
 
-        # 個別単語の一致
-        query_words = query_lower.split()
+        # 単純なキーワードマッチング基準（完全一致ボーナス + 個別単語の一致）
+        scores = np.fromiter((query_lower in content for content in contents), dtype=bool, count=count) * 10.0
         for word in query_words:
-            if len(word) > 2 and word in content:
-                score += 2.0
+            scores += np.fromiter((word in content for content in contents), dtype=bool, count=count) * 2.0
 
-        # 文書の長さで正規化
-        content_length = len(content)
-        if content_length > 0:
-            score = score / (content_length / 1000)  # 1000文字あたりで正規化
+        # 文書の長さで正規化（1000文字あたり、空文書は正規化しない）
+        lengths = np.fromiter((len(content) for content in contents), dtype=np.float64, count=count)
+        np.divide(scores, lengths / 1000, out=scores, where=lengths > 0)
 
-        return min(score, 100.0)  # 最大スコア100
+        return np.minimum(scores, 100.0)  # 最大スコア100
 
     def prepare_context(self, product_name: str, query: str, retrieved_documents: List[Dict[str, Any]]) -> str:
         """コンテキスト準備"""
         try:
-            # プロンプトマネージャーからコンテキスト準備プロンプトを取得
-            system_prompt = prompt_manager.get_rag_prompt("context_preparation", "generic", "system_prompt")
-            user_prompt = prompt_manager.get_rag_prompt(
-                "context_preparation",
-                "generic",
-                "user_prompt",
-                query=query,
-                product_name=product_name,
-                retrieved_documents=retrieved_documents,
-            )
-
-            # 基本的なコンテキスト構築
+            # 基本的なコンテキスト構築（LLM未使用のため、検索結果全体を埋め込むプロンプト生成は行わない）
             context_parts = []
             for i, doc in enumerate(retrieved_documents, 1):
                 content = doc.get("content", "")
@@ -327,18 +393,7 @@ class EnhancedRAGManager(RAGManager):
     ) -> Dict[str, Any]:
         """回答品質チェック"""
         try:
-            # プロンプトマネージャーから品質チェックプロンプトを取得
-            system_prompt = prompt_manager.get_rag_prompt("answer_validation", "generic", "system_prompt")
-            user_prompt = prompt_manager.get_rag_prompt(
-                "answer_validation",
-                "generic",
-                "user_prompt",
-                query=query,
-                generated_answer=generated_answer,
-                source_documents=source_documents,
-            )
-
-            # 簡易品質チェック
+            # 簡易品質チェック（LLM未使用のため、回答・情報源を埋め込むプロンプト生成は行わない）
             validation_result = {
                 "is_valid": True,
                 "confidence_score": self._calculate_confidence_score(query, generated_answer, source_documents),
@@ -382,7 +437,7 @@ class EnhancedRAGManager(RAGManager):
             score *= 1.1
 
         # 具体的な情報の有無
-        if any(char.isdigit() for char in answer):  # 数値が含まれている
+        if _DIGIT_PATTERN.search(answer):  # 数値が含まれている（全角数字を含む）
             score *= 1.05
 
         return min(score, 1.0)
@@ -390,28 +445,8 @@ class EnhancedRAGManager(RAGManager):
     def generate_fallback_response(self, product_name: str, query: str, error_context: str = "") -> str:
         """フォールバック応答生成"""
         try:
-            # プロンプトマネージャーからフォールバックプロンプトを取得
-            system_prompt = prompt_manager.get_rag_prompt("fallback_response", "generic", "system_prompt")
-            user_prompt = prompt_manager.get_rag_prompt(
-                "fallback_response",
-                "generic",
-                "user_prompt",
-                query=query,
-                product_name=product_name,
-                error_context=error_context,
-            )
-
             # 基本的なフォールバック応答
-            return f"""申し訳ございませんが、{product_name}に関する「{query}」について、
-十分な情報を見つけることができませんでした。
-
-以下をお試しください：
-1. 異なるキーワードで再度検索
-2. より具体的な質問内容に変更
-3. 管理画面から関連資料の追加
-4. 担当部署への直接問い合わせ
-
-ご不便をおかけして申し訳ありません。"""
+            return _FALLBACK_TEMPLATE.format(product_name=product_name, query=query)
 
         except Exception as e:
             self.logger.error(f"フォールバック応答生成エラー: {str(e)}")
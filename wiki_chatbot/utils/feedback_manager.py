@@ -8,15 +8,116 @@
 - 詳細分析のためのデータエクスポート機能
 """
 
+import atexit
 import csv
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TextIO, Tuple
 
-import pandas as pd
 import streamlit as st
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# チャット履歴CSVの書き込みバッファ設定（この秒数または行数に達したらまとめて追記）
+_CHAT_LOG_FLUSH_SECONDS = 5.0
+_CHAT_LOG_FLUSH_ROWS = 20
+
+# チャット履歴CSVのヘッダー（save_chat_message のレコード順）
+_CHAT_CSV_HEADERS = (
+    "timestamp",
+    "product_name",
+    "user_message",
+    "bot_response",
+    "sources_used",
+    "prompt_style",
+    "session_id",
+    "user_name",
+    "chat_id",
+    "message_sequence",
+    "message_length",
+    "response_length",
+    "sources_count",
+)
+
+# フィードバックCSVのヘッダー（save_feedback の行順）
+_FEEDBACK_CSV_HEADERS = (
+    "timestamp",
+    "product_name",
+    "session_id",
+    "chat_id",
+    "message_sequence",
+    "satisfaction",
+    "user_message",
+    "bot_response",
+    "prompt_style",
+    "feedback_reason",
+)
+
+# 統合エクスポートの列順（チャット履歴の列 + フィードバック列）
+_COMBINED_EXPORT_COLUMNS = (
+    "timestamp",
+    "product_name",
+    "session_id",
+    "chat_id",
+    "message_sequence",
+    "user_name",
+    "user_message",
+    "bot_response",
+    "sources_used",
+    "prompt_style",
+    "message_length",
+    "response_length",
+    "sources_count",
+    "satisfaction",
+    "feedback_reason",
+)
+
+# チャット履歴CSVの整数列（csvモジュールで読み込む際・DataFrame読み込み後に変換）
+_CHAT_INT_COLUMNS = ("message_sequence", "message_length", "response_length", "sources_count")
+
+# チャット履歴CSV読み込み時の列型（型推論を省略し、値の種類が少ない列はカテゴリ型でメモリを削減）
+# 数値・日時列は不正な行が1行あるだけで読み込み全体が失敗しないよう、読み込み後に変換する
+_CHAT_CSV_READ_OPTIONS: Dict[str, Any] = {
+    "dtype": {
+        "product_name": "category",
+        "prompt_style": "category",
+        "session_id": "string",
+        "user_name": "string",
+        "chat_id": "string",
+        "user_message": "string",
+        "bot_response": "string",
+        "sources_used": "string",
+    },
+}
+
+# フィードバックCSV読み込み時の列型（集計・不満足理由一覧で共有、型推論を省略し値の種類が少ない列はカテゴリ型）
+# prompt_style は商材で絞り込んだ後の value_counts に他商材のカテゴリが0件で混ざらないよう文字列型
+_FEEDBACK_CSV_READ_OPTIONS: Dict[str, Any] = {
+    "dtype": {
+        "product_name": "category",
+        "satisfaction": "category",
+        "prompt_style": "string",
+        "timestamp": "string",
+        "session_id": "string",
+        "chat_id": "string",
+        "user_message": "string",
+        "bot_response": "string",
+        "feedback_reason": "string",
+    },
+}
+
+# デバッグ表示フラグ（secrets は起動中に変わらないためモジュール読み込み時に一度だけ取得）
+try:
+    DEBUG_MODE = bool(st.secrets.get("DEBUG_MODE", False))
+except Exception:
+    DEBUG_MODE = False
+
 # 永続化データベースのインポート
 try:
     from config.database import persistent_db
@@ -24,6 +125,13 @@ try:
 except ImportError:
     PERSISTENT_DB_AVAILABLE = False
 
+# Parquetエクスポート用（任意）
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # GitHub同期のインポート
 try:
     from config.github_settings import GitHubConfig
@@ -33,7 +141,70 @@ except ImportError:
     GITHUB_SYNC_AVAILABLE = False
 
 
-@dataclass
+# 直近に整形したタイムスタンプ（同一秒内の再整形を省略）
+_formatted_second: Tuple[int, str] = (-1, "")
+
+
+def _format_now() -> str:
+    """現在時刻を "%Y-%m-%d %H:%M:%S" 形式で返す（秒が変わったときのみ整形）"""
+    global _formatted_second
+    second = int(time.time())
+    cached_second, formatted = _formatted_second
+    if second != cached_second:
+        formatted = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        _formatted_second = (second, formatted)
+    return formatted
+
+
+def _to_int(value: Any) -> int:
+    """CSVの値を整数に変換（空欄・不正値は0）"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _coerce_chat_columns(df: "pd.DataFrame") -> "pd.DataFrame":
+    """チャット履歴の整数列・日時列を変換（不正な値は欠損値にする）"""
+    import pandas as pd
+
+    for column in _CHAT_INT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").round().astype("Int32")
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    return df
+
+
+# パース済みCSVのキャッシュ
+# パスごとに ((更新時刻, サイズ), 読み込みオプション, {商材名(None=全件): DataFrame}) を保持
+_CSV_FRAME_CACHE: Dict[str, Tuple[Tuple[int, int], str, Dict[Optional[str], "pd.DataFrame"]]] = {}
+
+
+def _read_csv_cached(path: str, product_name: Optional[str] = None, **read_options: Any) -> "pd.DataFrame":
+    """CSVを読み込み商材で絞り込む（ファイルの更新時刻・サイズと読み込みオプションが前回と同じなら結果を再利用）"""
+    import pandas as pd
+
+    stat = os.stat(path)
+    file_key = (stat.st_mtime_ns, stat.st_size)
+    options_key = repr(sorted(read_options.items()))
+
+    cached = _CSV_FRAME_CACHE.get(path)
+    if cached is None or cached[0] != file_key or cached[1] != options_key:
+        cached = (file_key, options_key, {None: pd.read_csv(path, encoding="utf-8", **read_options)})
+        _CSV_FRAME_CACHE[path] = cached
+
+    frames = cached[2]
+    df = frames.get(product_name)
+    if df is None:
+        df = frames[None]
+        df = frames[product_name] = df[df["product_name"] == product_name]
+
+    # 呼び出し元での列の追加・置換がキャッシュに波及しないよう浅いコピーを返す
+    return df.copy(deep=False)
+
+
+@dataclass(frozen=True)
 class ChatMessage:
     """チャットメッセージレコード用データクラス。
 
@@ -62,7 +233,7 @@ class ChatMessage:
     message_sequence: int = 0
 
 
-@dataclass
+@dataclass(frozen=True)
 class UserFeedback:
     """ユーザーフィードバックレコード用データクラス。
 
@@ -153,11 +324,11 @@ class FeedbackManager:
                     repo_url=config["repo_url"],
                     token=config["token"]
                 )
-                if st.secrets.get("DEBUG_MODE", False):
+                if DEBUG_MODE:
                     st.write("🔍 DEBUG: GitHub sync initialized successfully")
             except Exception as e:
                 st.warning(f"GitHub同期初期化エラー: {e}")
-        elif st.secrets.get("DEBUG_MODE", False):
+        elif DEBUG_MODE:
             st.write(f"🔍 DEBUG: GitHub sync not available - GITHUB_SYNC_AVAILABLE: {GITHUB_SYNC_AVAILABLE}, is_configured: {GitHubConfig.is_configured() if GITHUB_SYNC_AVAILABLE else 'N/A'}")
 
         # 自動バックアップの設定
@@ -165,6 +336,9 @@ class FeedbackManager:
         self.backup_interval = st.secrets.get("BACKUP_INTERVAL_MESSAGES", 5)  # メッセージ5件ごと
         self.message_count_since_backup = 0
 
+        # エクスポート形式（"csv" または "parquet"）
+        self.export_format = str(st.secrets.get("EXPORT_FORMAT", "csv")).lower()
+
         # 時刻ベースバックアップ設定（1日3回: 9時、15時、21時）
         scheduled_hours_str = st.secrets.get("SCHEDULED_BACKUP_HOURS", "9,15,21")
         try:
@@ -173,70 +347,72 @@ class FeedbackManager:
             self.scheduled_backup_hours = [9, 15, 21]  # デフォルト値
         self.last_scheduled_backup_date = None
 
+        # チャット履歴のバックグラウンド書き込み用（1スレッドで書き込み順序を保証）
+        # DBは書き込みスレッドで溜まった分をすぐにまとめて挿入し、CSVは一定時間・件数ごとにまとめて追記する
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feedback-writer")
+        self._pending_chat_rows: List[Tuple[Any, ...]] = []
+        self._pending_db_rows: List[Tuple[str, ...]] = []
+        self._db_flush_queued = False
+        self._chat_log_lock = threading.Lock()  # バッファ操作のみ（I/O中は保持しない）
+        self._chat_flush_lock = threading.Lock()  # 書き出し順序の保証用
+        self._flush_timer: Optional[threading.Timer] = None
+        # CSV追記用ファイルハンドル（パスごとに保持して再利用）
+        self._csv_handles: Dict[str, Tuple[TextIO, Any]] = {}
+        self._csv_handle_lock = threading.Lock()
+
+        # GitHubバックアップ用（通信を画面操作から切り離し、開始待ちのバックアップは1件に統合）
+        self._backup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="github-backup")
+        self._backup_lock = threading.Lock()
+        self._backup_queued = False
+
+        # 終了時は書き込み待ちの履歴 → 実行中のバックアップ → ファイルハンドルの順に片付ける（atexitは登録の逆順）
+        atexit.register(self.close_csv_handles)
+        atexit.register(self._backup_executor.shutdown, wait=True)
+        atexit.register(self.flush_chat_log)
+        atexit.register(self._writer.shutdown, wait=True)
+
+
+        # エクスポート結果のキャッシュ（種類・商材・形式ごとに元ファイルの更新時刻・サイズと出力パスを保持）
+        self._export_cache: Dict[Tuple[str, Optional[str], str], Tuple[Tuple[Any, ...], str]] = {}
+
     def _initialize_csv_files(self):
         """CSVファイルのヘッダーを初期化"""
 
         # チャット履歴ファイル
         if not os.path.exists(self.chat_log_file):
-            chat_headers = [
-                "timestamp",
-                "product_name",
-                "user_message",
-                "bot_response",
-                "sources_used",
-                "prompt_style",
-                "session_id",
-                "user_name",
-                "chat_id",
-                "message_sequence",
-                "message_length",
-                "response_length",
-                "sources_count",
-            ]
             with open(self.chat_log_file, "w", newline="", encoding="utf-8") as f:
                 writer = csv.writer(f)
-                writer.writerow(chat_headers)
+                writer.writerow(_CHAT_CSV_HEADERS)
 
         # フィードバックファイル
         if not os.path.exists(self.feedback_file):
-            feedback_headers = [
-                "timestamp",
-                "product_name",
-                "session_id",
-                "chat_id",
-                "message_sequence",
-                "satisfaction",
-                "user_message",
-                "bot_response",
-                "prompt_style",
-                "feedback_reason",
-            ]
             with open(self.feedback_file, "w", newline="", encoding="utf-8") as f:
                 writer = csv.writer(f)
-                writer.writerow(feedback_headers)
+                writer.writerow(_FEEDBACK_CSV_HEADERS)
 
     def get_session_id(self, product_name: str) -> str:
         """セッションIDを取得または生成"""
         session_key = f"session_id_{product_name}"
 
-        if session_key not in st.session_state:
+        session_id = st.session_state.get(session_key)
+        if session_id is None:
             # 新しいセッションIDを生成
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            st.session_state[session_key] = f"{product_name}_{timestamp}"
-            st.session_state[f"session_start_{product_name}"] = datetime.now()
+            now = datetime.now()
+            session_id = st.session_state[session_key] = f"{product_name}_{now:%Y%m%d_%H%M%S}"
+            st.session_state[f"session_start_{product_name}"] = now
 
-        return st.session_state[session_key]
+        return session_id
 
     def get_next_message_sequence(self, product_name: str) -> int:
         """セッション内での次のメッセージ順序番号を取得"""
-        session_id = self.get_session_id(product_name)
-        sequence_key = f"message_sequence_{session_id}"
-
-        if sequence_key not in st.session_state:
-            st.session_state[sequence_key] = 0
+        return self._next_message_sequence(self.get_session_id(product_name))
 
-        st.session_state[sequence_key] += 1
-        return st.session_state[sequence_key]
+    @staticmethod
+    def _next_message_sequence(session_id: str) -> int:
+        """取得済みのセッションIDで次のメッセージ順序番号を採番"""
+        sequence_key = f"message_sequence_{session_id}"
+        sequence = st.session_state[sequence_key] = st.session_state.get(sequence_key, 0) + 1
+        return sequence
 
     def generate_chat_id(self, session_id: str, sequence: int) -> str:
         """チャットIDを生成（session_id + sequence番号）"""
@@ -253,20 +429,19 @@ class FeedbackManager:
 
         # 今日まだバックアップしていない場合
         if self.last_scheduled_backup_date != current_date:
-            # 設定時刻に達している場合
+            # 設定時刻に達している場合（失敗時は日付を戻して次回のチェックで再試行）
             if current_hour in self.scheduled_backup_hours:
-                try:
-                    success = self.github_sync.upload_data(f"Scheduled backup ({current_hour}:00) - {now.isoformat()}")
-                    if success:
-                        self.last_scheduled_backup_date = current_date
-                        if st.secrets.get("DEBUG_MODE", False):
-                            st.success(f"✅ 定期バックアップ完了 ({current_hour}時)")
-                    else:
-                        if st.secrets.get("DEBUG_MODE", False):
-                            st.warning(f"⚠️ 定期バックアップ失敗 ({current_hour}時)")
-                except Exception as e:
-                    if st.secrets.get("DEBUG_MODE", False):
-                        st.error(f"❌ 定期バックアップエラー: {e}")
+                self.last_scheduled_backup_date = current_date
+
+                def on_result(success: bool) -> None:
+                    if not success and self.last_scheduled_backup_date == current_date:
+                        self.last_scheduled_backup_date = None
+
+                self._submit_backup(
+                    f"Scheduled backup ({current_hour}:00) - {now.isoformat()}",
+                    f"定期バックアップ ({current_hour}時)",
+                    on_result,
+                )
 
     def _trigger_auto_backup(self, action: str = "Auto backup"):
         """自動バックアップをトリガーする"""
@@ -278,40 +453,52 @@ class FeedbackManager:
 
         self.message_count_since_backup += 1
 
-        # 指定した間隔でバックアップを実行
+        # 指定した間隔でバックアップを実行（成功するまでカウントは維持）
         if self.message_count_since_backup >= self.backup_interval:
-            try:
-                success = self.github_sync.upload_data(f"{action} - {datetime.now().isoformat()}")
+
+            def on_result(success: bool) -> None:
                 if success:
                     self.message_count_since_backup = 0
-                    if st.secrets.get("DEBUG_MODE", False):
-                        st.success(f"✅ 自動バックアップ完了 ({action})")
-                else:
-                    if st.secrets.get("DEBUG_MODE", False):
-                        st.warning(f"⚠️ 自動バックアップ失敗 ({action})")
-            except Exception as e:
-                if st.secrets.get("DEBUG_MODE", False):
-                    st.error(f"❌ 自動バックアップエラー: {e}")
+
+            self._submit_backup(f"{action} - {datetime.now().isoformat()}", f"自動バックアップ ({action})", on_result)
 
     def _simple_backup(self, action: str = "Backup"):
         """シンプルなバックアップ実行"""
         if not self.github_sync:
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write("🔍 DEBUG: GitHub sync not configured, skipping backup")
             return
 
-        if st.secrets.get("DEBUG_MODE", False):
+        if DEBUG_MODE:
             st.write(f"🔍 DEBUG: Starting backup with action: {action}")
+        self._submit_backup(action, "バックアップ")
+
+    def _submit_backup(
+        self, commit_message: str, label: str, on_result: Optional[Callable[[bool], None]] = None
+    ) -> None:
+        """GitHubバックアップをバックグラウンドで実行（開始待ちのバックアップがあれば統合）"""
+        with self._backup_lock:
+            if self._backup_queued:
+                return
+            self._backup_queued = True
+        self._backup_executor.submit(self._run_backup, commit_message, label, on_result)
+
+    def _run_backup(self, commit_message: str, label: str, on_result: Optional[Callable[[bool], None]]) -> None:
+        """バックアップ用スレッドでチャット履歴を書き出してからGitHubへアップロード"""
+        # 開始後に発生した変更は次のバックアップで反映するため、ここで待機フラグを解除
+        with self._backup_lock:
+            self._backup_queued = False
+
+        success = False
         try:
-            success = self.github_sync.upload_data(action)
-            if success and st.secrets.get("DEBUG_MODE", False):
-                st.success("✅ バックアップ完了")
-            elif not success and st.secrets.get("DEBUG_MODE", False):
-                st.warning("⚠️ バックアップ失敗")
+            self.flush_chat_log()
+            success = bool(self.github_sync.upload_data(commit_message))
+            if DEBUG_MODE:
+                print(f"[FeedbackManager] {label}{'完了' if success else '失敗'}")
         except Exception as e:
-            if st.secrets.get("DEBUG_MODE", False):
-                st.error(f"❌ バックアップエラー: {e}")
-                st.write(f"🔍 DEBUG: Backup error details - {type(e).__name__}: {e}")
+            print(f"[FeedbackManager] {label}エラー: {e}")
+        if on_result is not None:
+            on_result(success)
 
     def _schedule_delayed_backup(self, action: str = "Delayed backup", delay_seconds: int = 10):
         """遅延バックアップをスケジュール（複数ファイル処理時の重複回避）"""
@@ -324,7 +511,7 @@ class FeedbackManager:
         st.session_state.pending_backup_time = datetime.now().timestamp() + delay_seconds
 
         # ユーザーへの通知
-        if st.secrets.get("DEBUG_MODE", False):
+        if DEBUG_MODE:
             st.info(f"⏰ {delay_seconds}秒後にバックアップ実行予定: {action}")
 
     def _check_delayed_backup(self):
@@ -341,77 +528,199 @@ class FeedbackManager:
             delattr(st.session_state, 'pending_backup_action')
 
     def save_chat_message(
-        self, product_name: str, user_message: str, bot_response: str, sources_used: List[str], prompt_style: str, user_name: str = ""
+        self,
+        product_name: str,
+        user_message: str,
+        bot_response: str,
+        sources_used: List[str],
+        prompt_style: str,
+        user_name: str = "",
+        background: bool = False,
     ):
-        """チャットメッセージを保存（永続化データベース + CSV）"""
+        """チャットメッセージを保存（永続化データベース + CSV）
+
+        background=True の場合、セッションIDと順序番号の採番のみ呼び出し元で行い、
+        ファイル・DB書き込みと自動バックアップはバックグラウンドスレッドで実行します。
+        """
 
         try:
             session_id = self.get_session_id(product_name)
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            timestamp = _format_now()
 
             # チャットIDとシーケンス番号を生成
-            message_sequence = self.get_next_message_sequence(product_name)
+            message_sequence = self._next_message_sequence(session_id)
             chat_id = self.generate_chat_id(session_id, message_sequence)
 
             # ボットの回答から参考情報源部分を除去してクリーンな回答のみ抽出
-            clean_response = bot_response.split("---\n### 📚 参考にした情報源")[0].strip()
-            sources_string = "; ".join(sources_used)
+            clean_response = bot_response.partition("---\n### 📚 参考にした情報源")[0].strip()
+
+            # CSV行はタプルで保持し、書き出し時に writerows でまとめて直列化
+            record = (
+                timestamp,
+                product_name,
+                user_message,
+                clean_response,
+                "; ".join(sources_used),
+                prompt_style,
+                session_id,
+                user_name,
+                chat_id,
+                message_sequence,
+                len(user_message),
+                len(clean_response),
+                len(sources_used),
+            )
+
+            if background:
+                future = self._writer.submit(self._write_chat_record, record)
+                future.add_done_callback(self._report_write_error)
+            else:
+                self._write_chat_record(record)
 
-            # 永続化データベースに保存（優先）
-            if PERSISTENT_DB_AVAILABLE:
+            return True
+
+        except Exception as e:
+            st.error(f"チャット履歴保存エラー: {str(e)}")
+            return False
+
+    def _write_chat_record(self, record: Tuple[Any, ...]) -> None:
+        """チャット履歴1件を書き込みバッファに追加し、自動バックアップを判定"""
+        _, product_name, user_message, clean_response, sources_string, prompt_style, session_id = record[:7]
+
+        # 永続化データベース用の行（DBのタイムスタンプはISO形式）
+        db_row = (
+            datetime.now().isoformat(),
+            session_id,
+            product_name,
+            user_message,
+            clean_response,
+            sources_string,
+            prompt_style,
+        )
+
+        # 永続化データベースへは書き込みスレッドで即時、CSVへは一定時間・件数ごとにまとめて書き込み
+        self._buffer_chat_row(record, db_row)
+
+        # 自動バックアップをトリガー
+        self._trigger_auto_backup("Chat message saved")
+
+    def _buffer_chat_row(self, record: Tuple[Any, ...], db_row: Tuple[str, ...]) -> None:
+        """チャット履歴行をバッファに追加
+
+        DB行は書き込みスレッドへ挿入処理を1件だけ予約し、予約済みの処理が実行されるまでに溜まった行を
+        まとめて挿入する（履歴表示・セッション統計・古いデータの削除がDBを参照するため遅延させない）。
+        CSV行は件数上限で即時、それ以外はタイマーで書き出す。
+        """
+        with self._chat_log_lock:
+            self._pending_chat_rows.append(record)
+            self._pending_db_rows.append(db_row)
+            schedule_db_flush = not self._db_flush_queued
+            self._db_flush_queued = True
+            flush_now = len(self._pending_chat_rows) >= _CHAT_LOG_FLUSH_ROWS
+            if not flush_now and self._flush_timer is None:
+                self._flush_timer = threading.Timer(_CHAT_LOG_FLUSH_SECONDS, self.flush_chat_log)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+        if schedule_db_flush:
+            try:
+                self._writer.submit(self._flush_db_rows).add_done_callback(self._report_write_error)
+            except RuntimeError:
+                # 終了処理で書き込みスレッドが停止済みの場合はその場で書き込む
+                self._flush_db_rows()
+
+        if flush_now:
+            self.flush_chat_log()
+
+    def _drain_chat_log(self) -> None:
+        """書き込みスレッドに積まれた保存処理を待ってからバッファを書き出す（読み込み前に最新の履歴を反映）"""
+        try:
+            self._writer.submit(self.flush_chat_log).result()
+        except RuntimeError:
+            # 終了処理で書き込みスレッドが停止済みの場合はその場で書き出す
+            self.flush_chat_log()
+
+    def _flush_db_rows(self) -> None:
+        """バッファ済みのDB行を永続化データベースへ1トランザクションで挿入（ロック外でI/O）"""
+        with self._chat_flush_lock:
+            with self._chat_log_lock:
+                rows, self._pending_db_rows = self._pending_db_rows, []
+                self._db_flush_queued = False
+
+            if rows and PERSISTENT_DB_AVAILABLE:
                 try:
-                    persistent_db.save_chat_message(
-                        session_id=session_id,
-                        product_name=product_name,
-                        user_message=user_message,
-                        bot_response=clean_response,
-                        sources_used=sources_string,
-                        prompt_style=prompt_style
-                    )
+                    persistent_db.save_chat_messages_bulk(rows)
                 except Exception as db_error:
-                    st.warning(f"データベース保存エラー: {db_error}")
+                    print(f"[FeedbackManager] データベース保存エラー: {db_error}")
 
-            # CSVに追記（バックアップ・互換性のため）
-            with open(self.chat_log_file, "a", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(
-                    [
-                        timestamp,
-                        product_name,
-                        user_message,
-                        clean_response,
-                        sources_string,
-                        prompt_style,
-                        session_id,
-                        user_name,
-                        chat_id,
-                        message_sequence,
-                        len(user_message),
-                        len(clean_response),
-                        len(sources_used),
-                    ]
-                )
+    def flush_chat_log(self) -> None:
+        """バッファ済みのチャット履歴を永続化データベースとCSVへまとめて書き込み
 
-            # 自動バックアップをトリガー
-            self._trigger_auto_backup("Chat message saved")
+        バッファの取り出しのみロック内で行い、書き込みはロック解放後に実行する
+        （保存処理の呼び出し元がディスクI/Oで待たされないようにする）。
+        """
+        # 永続化データベースに保存（優先）
+        self._flush_db_rows()
 
-            return True
+        with self._chat_flush_lock:
+            with self._chat_log_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                rows, self._pending_chat_rows = self._pending_chat_rows, []
 
-        except Exception as e:
-            st.error(f"チャット履歴保存エラー: {str(e)}")
+            # CSVに追記（バックアップ・互換性のため）
+            if rows:
+                self._append_csv_rows(self.chat_log_file, rows)
+
+    def _append_csv_rows(self, path: str, rows: List[Tuple[Any, ...]]) -> None:
+        """CSVへ行を追記（ハンドルを保持して再利用し、ファイルが差し替えられた場合は開き直す）"""
+        with self._csv_handle_lock:
+            entry = self._csv_handles.get(path)
+            if entry is not None and not self._is_same_file(entry[0], path):
+                entry[0].close()
+                entry = None
+            if entry is None:
+                handle = open(path, "a", newline="", encoding="utf-8", buffering=1 << 16)
+                entry = self._csv_handles[path] = (handle, csv.writer(handle))
+
+            handle, writer = entry
+            writer.writerows(rows)
+            handle.flush()  # 読み込み側（エクスポート・GitHub同期）から最新行が見えるようにする
+
+    @staticmethod
+    def _is_same_file(handle: TextIO, path: str) -> bool:
+        """保持中のハンドルが現在のパスと同じファイルを指しているか（GitHub復元時の差し替え対策）"""
+        try:
+            return os.path.samestat(os.fstat(handle.fileno()), os.stat(path))
+        except OSError:
             return False
 
+    def close_csv_handles(self) -> None:
+        """保持中のCSVファイルハンドルを閉じる"""
+        with self._csv_handle_lock:
+            for handle, _ in self._csv_handles.values():
+                handle.close()
+            self._csv_handles.clear()
+
+    @staticmethod
+    def _report_write_error(future: Future) -> None:
+        """バックグラウンド書き込みの失敗をログ出力（画面には表示できないため）"""
+        error = future.exception()
+        if error is not None:
+            print(f"[FeedbackManager] チャット履歴保存エラー: {error}")
+
     def save_feedback(self, product_name: str, chat_id: str, message_sequence: int, satisfaction: str,
                      user_message: str, bot_response: str, prompt_style: str, feedback_reason: str = ""):
         """ユーザーフィードバックを保存（個別チャット単位）"""
 
         # デバッグ情報
-        if st.secrets.get("DEBUG_MODE", False):
+        if DEBUG_MODE:
             st.write(f"🔍 DEBUG: Attempting to save feedback - {satisfaction}, chat_id: {chat_id}")
 
         try:
             session_id = self.get_session_id(product_name)
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            timestamp = _format_now()
 
             # 永続化データベースに保存（優先）
             if PERSISTENT_DB_AVAILABLE:
@@ -429,46 +738,96 @@ class FeedbackManager:
                     st.warning(f"フィードバックDB保存エラー: {db_error}")
 
             # CSVに追記（新しい構造）
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write(f"🔍 DEBUG: Attempting to write to CSV file: {self.feedback_file}")
-            with open(self.feedback_file, "a", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    timestamp,
-                    product_name,
-                    session_id,
-                    chat_id,
-                    message_sequence,
-                    satisfaction,
-                    user_message[:200],  # 長すぎる場合は切り詰め
-                    bot_response[:200],   # 長すぎる場合は切り詰め
-                    prompt_style,
-                    feedback_reason
-                ])
+            self._append_csv_rows(self.feedback_file, [(
+                timestamp,
+                product_name,
+                session_id,
+                chat_id,
+                message_sequence,
+                satisfaction,
+                user_message[:200],  # 長すぎる場合は切り詰め
+                bot_response[:200],   # 長すぎる場合は切り詰め
+                prompt_style,
+                feedback_reason
+            )])
 
             # フィードバック保存時は即座にバックアップ（重要データのため）
             self._simple_backup("Feedback saved")
 
             # デバッグ情報
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write(f"✅ DEBUG: Feedback saved successfully to CSV and triggered backup")
 
             return True
 
         except Exception as e:
             st.error(f"フィードバック保存エラー: {str(e)}")
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write(f"🔍 DEBUG: Error details - {type(e).__name__}: {e}")
             return False
 
+    def _write_export(self, df: "pd.DataFrame", export_stem: str) -> str:
+        """エクスポート用ファイルを書き出してパスを返す（EXPORT_FORMAT=parquet かつ pyarrow 利用可能時はParquet）"""
+        if self.export_format == "parquet" and PYARROW_AVAILABLE:
+            export_path = os.path.join(self.data_dir, f"{export_stem}.parquet")
+            df.to_parquet(export_path, engine="pyarrow", compression="zstd", index=False)
+        else:
+            # CSVエクスポート（Excelで開けるようBOM付き）
+            export_path = os.path.join(self.data_dir, f"{export_stem}.csv")
+            df.to_csv(export_path, index=False, encoding="utf-8-sig")
+        return export_path
+
+    @staticmethod
+    def _export_signature(*paths: str) -> Tuple[Optional[Tuple[int, int]], ...]:
+        """エクスポート元ファイルの更新時刻・サイズを取得（存在しないファイルはNone）"""
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _get_cached_export(
+        self, export_kind: str, product_name: Optional[str], signature: Tuple[Any, ...]
+    ) -> Optional[str]:
+        """元ファイルが未更新で前回のエクスポートファイルが残っていればそのパスを返す"""
+        # デバッグ表示が必要な場合は毎回エクスポート
+        if DEBUG_MODE:
+            return None
+
+        cached = self._export_cache.get((export_kind, product_name, self.export_format))
+        if cached and cached[0] == signature and os.path.exists(cached[1]):
+            return cached[1]
+        return None
+
+    def _remember_export(
+        self, export_kind: str, product_name: Optional[str], signature: Tuple[Any, ...], export_path: str
+    ) -> str:
+        """エクスポート結果をキャッシュに登録してパスを返す"""
+        self._export_cache[(export_kind, product_name, self.export_format)] = (signature, export_path)
+        return export_path
+
     def export_chat_history(self, product_name: str = None) -> Optional[str]:
         """チャット履歴をエクスポート"""
+        import pandas as pd
 
         try:
+            self._drain_chat_log()
             if not os.path.exists(self.chat_log_file):
                 return None
 
-            df = pd.read_csv(self.chat_log_file, encoding="utf-8")
+            # 元ファイルが前回から変わっていなければ前回のエクスポートファイルを再利用
+            signature = self._export_signature(self.chat_log_file)
+            cached_path = self._get_cached_export("chat_history", product_name, signature)
+            if cached_path:
+                return cached_path
+
+            df = _coerce_chat_columns(pd.read_csv(self.chat_log_file, encoding="utf-8", **_CHAT_CSV_READ_OPTIONS))
 
             # 製品フィルタリング
             if product_name:
@@ -479,13 +838,8 @@ class FeedbackManager:
 
             # エクスポートファイル名生成
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            export_filename = f"chat_export_{product_name or 'all'}_{timestamp}.csv"
-            export_path = os.path.join(self.data_dir, export_filename)
-
-            # CSVエクスポート
-            df.to_csv(export_path, index=False, encoding="utf-8-sig")
-
-            return export_path
+            export_path = self._write_export(df, f"chat_export_{product_name or 'all'}_{timestamp}")
+            return self._remember_export("chat_history", product_name, signature, export_path)
 
         except FileNotFoundError:
             st.error("チャット履歴ファイルが見つかりません。まずチャットを実行してください。")
@@ -499,12 +853,20 @@ class FeedbackManager:
 
     def export_conversation_format(self, product_name: str = None) -> Optional[str]:
         """会話形式でチャット履歴をエクスポート（Q&Aペア構造）"""
+        import pandas as pd
 
         try:
+            self._drain_chat_log()
             if not os.path.exists(self.chat_log_file):
                 return None
 
-            df = pd.read_csv(self.chat_log_file, encoding="utf-8")
+            # 元ファイルが前回から変わっていなければ前回のエクスポートファイルを再利用
+            signature = self._export_signature(self.chat_log_file)
+            cached_path = self._get_cached_export("conversation", product_name, signature)
+            if cached_path:
+                return cached_path
+
+            df = _coerce_chat_columns(pd.read_csv(self.chat_log_file, encoding="utf-8", **_CHAT_CSV_READ_OPTIONS))
 
             # 必要な列の存在確認
             required_columns = ['chat_id', 'message_sequence', 'session_id', 'user_message', 'bot_response']
@@ -520,42 +882,37 @@ class FeedbackManager:
             if df.empty:
                 return None
 
-            # セッション毎にグループ化してソート
-            df = df.sort_values(['session_id', 'message_sequence'])
-
-            # 会話形式データの作成
-            conversations = []
-            for session_id, session_group in df.groupby('session_id'):
-                for _, row in session_group.iterrows():
-                    conversation_entry = {
-                        'session_id': session_id,
-                        'chat_id': row['chat_id'],
-                        'message_sequence': row['message_sequence'],
-                        'timestamp': row['timestamp'],
-                        'product_name': row['product_name'],
-                        'user_name': row.get('user_name', ''),
-                        'user_question': row['user_message'],
-                        'bot_answer': row['bot_response'],
-                        'reference_sources': row['sources_used'],
-                        'prompt_style': row['prompt_style'],
-                        'question_length': row.get('message_length', len(row['user_message'])),
-                        'answer_length': row.get('response_length', len(row['bot_response'])),
-                        'sources_count': row.get('sources_count', 0)
-                    }
-                    conversations.append(conversation_entry)
-
-            # DataFrameに変換
-            conversation_df = pd.DataFrame(conversations)
+            # セッション毎・メッセージ順にソート（セッションIDのない行は対象外）
+            df = df.dropna(subset=['session_id']).sort_values(['session_id', 'message_sequence'])
+
+            # 会話形式データの作成（行ごとのループではなく列名の付け替えと不足列の補完で構築）
+            conversation_df = df.rename(columns={
+                'user_message': 'user_question',
+                'bot_response': 'bot_answer',
+                'sources_used': 'reference_sources',
+                'message_length': 'question_length',
+                'response_length': 'answer_length',
+            })
+            fallback_columns = {
+                'user_name': '',
+                'question_length': lambda frame: frame['user_question'].str.len(),
+                'answer_length': lambda frame: frame['bot_answer'].str.len(),
+                'sources_count': 0,
+            }
+            conversation_df = conversation_df.assign(
+                **{col: value for col, value in fallback_columns.items() if col not in conversation_df.columns}
+            )
+            conversation_df = conversation_df[[
+                'session_id', 'chat_id', 'message_sequence', 'timestamp', 'product_name', 'user_name',
+                'user_question', 'bot_answer', 'reference_sources', 'prompt_style',
+                'question_length', 'answer_length', 'sources_count'
+            ]]
 
             # エクスポートファイル名生成
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            export_filename = f"conversation_export_{product_name or 'all'}_{timestamp}.csv"
-            export_path = os.path.join(self.data_dir, export_filename)
-
-            # CSVエクスポート
-            conversation_df.to_csv(export_path, index=False, encoding="utf-8-sig")
-
-            return export_path
+            export_stem = f"conversation_export_{product_name or 'all'}_{timestamp}"
+            export_path = self._write_export(conversation_df, export_stem)
+            return self._remember_export("conversation", product_name, signature, export_path)
 
         except FileNotFoundError:
             st.error("チャット履歴ファイルが見つかりません。まずチャットを実行してください。")
@@ -572,14 +929,24 @@ class FeedbackManager:
 
     def export_combined_data(self, product_name: str = None) -> Optional[str]:
         """チャット履歴とフィードバックを統合してエクスポート"""
+        import pandas as pd
 
         try:
             # チャット履歴を読み込み
+            self._drain_chat_log()
             if not os.path.exists(self.chat_log_file):
                 st.error("チャット履歴ファイルが存在しません")
                 return None
 
-            chat_df = pd.read_csv(self.chat_log_file, encoding="utf-8")
+            # 元ファイルが前回から変わっていなければ前回のエクスポートファイルを再利用
+            signature = self._export_signature(self.chat_log_file, self.feedback_file)
+            cached_path = self._get_cached_export("combined", product_name, signature)
+            if cached_path:
+                return cached_path
+
+            chat_df = _coerce_chat_columns(
+                pd.read_csv(self.chat_log_file, encoding="utf-8", **_CHAT_CSV_READ_OPTIONS)
+            )
 
             # 必要な列の存在確認
             required_chat_columns = ['chat_id', 'message_sequence', 'session_id', 'user_message', 'bot_response', 'timestamp', 'product_name']
@@ -618,55 +985,34 @@ class FeedbackManager:
                 st.warning("エクスポート対象のデータがありません")
                 return None
 
-            # フィードバックデータがある場合、session_idでマージ
+            # フィードバックデータがある場合、chat_idで結合
             if feedback_df is not None and not feedback_df.empty:
-                # session_idのデータ型を統一（マージエラー対策）
-                try:
-                    chat_df['session_id'] = chat_df['session_id'].astype(str)
-                    feedback_df['session_id'] = feedback_df['session_id'].astype(str)
-                except Exception as e:
-                    st.warning(f"session_id型変換エラー: {e}")
-                    # 型変換に失敗した場合は文字列に強制変換
-                    chat_df['session_id'] = chat_df['session_id'].apply(str)
-                    feedback_df['session_id'] = feedback_df['session_id'].apply(str)
-
-                # デバッグ情報（開発時のみ表示）
-                if st.secrets.get("DEBUG_MODE", False):
-                    st.write(f"🔍 マージ前データ確認:")
-                    st.write(f"チャット履歴: {len(chat_df)}件")
-                    st.write(f"フィードバック: {len(feedback_df)}件")
-                    st.write(f"チャットsession_id型: {chat_df['session_id'].dtype}")
-                    st.write(f"フィードバックsession_id型: {feedback_df['session_id'].dtype}")
-                    st.write(f"共通session_id: {set(chat_df['session_id']) & set(feedback_df['session_id'])}")
-
-                    # chat_idでフィードバック情報を結合
-                feedback_columns = ['chat_id', 'satisfaction', 'feedback_reason']
+                # chat_idでフィードバック情報を結合（結合キーの辞書引きで列を追加、同一chat_idは最新の評価を採用）
+                feedback_columns = ['satisfaction', 'feedback_reason']
                 available_feedback_columns = [col for col in feedback_columns if col in feedback_df.columns]
 
                 try:
-                    combined_df = pd.merge(
-                        chat_df,
-                        feedback_df[available_feedback_columns],
-                        on='chat_id',
-                        how='left'
+                    feedback_by_chat = (
+                        feedback_df[['chat_id', *available_feedback_columns]]
+                        .drop_duplicates('chat_id', keep='last')
+                        .set_index('chat_id')
+                    )
+                    combined_df = chat_df.assign(
+                        **{col: chat_df['chat_id'].map(feedback_by_chat[col]) for col in available_feedback_columns}
                     )
                 except Exception as merge_error:
                     st.error(f"chat_idマージエラー: {merge_error}")
                     st.warning("フィードバックデータなしでエクスポートします")
-                    combined_df = chat_df.copy()
-                    combined_df['satisfaction'] = None
-                    combined_df['feedback_reason'] = None
+                    combined_df = chat_df.assign(satisfaction=None, feedback_reason=None)
 
                 # デバッグ情報（開発時のみ表示）
-                if st.secrets.get("DEBUG_MODE", False):
+                if DEBUG_MODE:
                     st.write(f"マージ後: {len(combined_df)}件")
                     satisfaction_filled = combined_df['satisfaction'].notna().sum()
                     st.write(f"満足度データ有り: {satisfaction_filled}件")
             else:
-                # フィードバックデータがない場合はチャット履歴のみ
-                combined_df = chat_df.copy()
-                combined_df['satisfaction'] = None
-                combined_df['feedback_reason'] = None
+                # フィードバックデータがない場合はチャット履歴のみ（列追加と複製を1回で実施）
+                combined_df = chat_df.assign(satisfaction=None, feedback_reason=None)
 
             # 不足している列を補完
             expected_feedback_columns = ['satisfaction', 'feedback_reason']
@@ -676,22 +1022,14 @@ class FeedbackManager:
 
             # エクスポートファイル名生成
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            export_filename = f"combined_export_{product_name or 'all'}_chat_based_{timestamp}.csv"
-            export_path = os.path.join(self.data_dir, export_filename)
-
-            # 列の順序を整理
-            column_order = [
-                'timestamp', 'product_name', 'session_id', 'chat_id', 'message_sequence', 'user_name',
-                'user_message', 'bot_response', 'sources_used', 'prompt_style', 'message_length',
-                'response_length', 'sources_count', 'satisfaction', 'feedback_reason'
-            ]
-
-            # 存在する列のみ選択
-            available_columns = [col for col in column_order if col in combined_df.columns]
+            export_stem = f"combined_export_{product_name or 'all'}_chat_based_{timestamp}"
+
+            # 列の順序を整理（存在する列のみ選択）
+            available_columns = [col for col in _COMBINED_EXPORT_COLUMNS if col in combined_df.columns]
             combined_df = combined_df[available_columns]
 
             # 最終デバッグ情報（開発時のみ表示）
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write(f"📊 エクスポート最終データ:")
                 st.write(f"総件数: {len(combined_df)}")
                 st.write(f"列: {list(combined_df.columns)}")
@@ -699,10 +1037,8 @@ class FeedbackManager:
                     satisfaction_counts = combined_df['satisfaction'].value_counts(dropna=False)
                     st.write(f"満足度分布: {satisfaction_counts.to_dict()}")
 
-            # CSVエクスポート
-            combined_df.to_csv(export_path, index=False, encoding="utf-8-sig")
-
-            return export_path
+            export_path = self._write_export(combined_df, export_stem)
+            return self._remember_export("combined", product_name, signature, export_path)
 
         except FileNotFoundError:
             st.error("チャット履歴ファイルが見つかりません。まずチャットを実行してください。")
@@ -718,36 +1054,45 @@ class FeedbackManager:
             return None
 
     def get_feedback_summary(self, product_name: str = None) -> Dict[str, Any]:
+        """フィードバック集計結果を取得（読み込み・絞り込み結果はファイル未更新の間再利用）"""
+        if not os.path.exists(self.feedback_file):
+            return {}
+        return self._build_feedback_summary(product_name)
+
+    def _load_feedback(self, product_name: str = None) -> "pd.DataFrame":
+        """商材で絞り込んだフィードバックデータを取得（集計・不満足理由一覧で共有）"""
+        return _read_csv_cached(self.feedback_file, product_name or None, **_FEEDBACK_CSV_READ_OPTIONS)
+
+    def _build_feedback_summary(self, product_name: str = None) -> Dict[str, Any]:
         """フィードバック集計結果を取得（個別チャット単位）"""
+        import pandas as pd
 
         try:
             if not os.path.exists(self.feedback_file):
                 return {}
 
             # デバッグ情報（一時的に表示）
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write(f"🔍 フィードバック分析対象ファイル: {self.feedback_file}")
 
-            df = pd.read_csv(self.feedback_file, encoding="utf-8")
+            # 商材で絞り込んだフィードバックデータ（不満足理由一覧と共有）
+            df = self._load_feedback(product_name)
 
             # デバッグ情報（一時的に表示）
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write(f"読み込んだデータ形状: {df.shape}")
                 st.write(f"列名: {list(df.columns)}")
                 if len(df) > 0:
                     st.write("先頭3行:")
                     st.dataframe(df.head(3))
 
-            # 製品フィルタリング
-            if product_name:
-                df = df[df["product_name"] == product_name]
-
             if df.empty:
                 return {}
 
             total_feedback = len(df)
-            satisfied = len(df[df["satisfaction"] == "満足"])
-            dissatisfied = len(df[df["satisfaction"] == "不満足"])
+            satisfaction_counts = df["satisfaction"].value_counts()
+            satisfied = int(satisfaction_counts.get("満足", 0))
+            dissatisfied = int(satisfaction_counts.get("不満足", 0))
 
             # 個別チャット単位の集計
             summary = {
@@ -767,38 +1112,15 @@ class FeedbackManager:
             # 不満足理由の有無
             if 'feedback_reason' in df.columns:
                 try:
-                    # feedback_reason列を安全に文字列として処理
-                    df_safe = df.copy()
-
-                    # NaN値を先に空文字列に置換
-                    df_safe['feedback_reason'] = df_safe['feedback_reason'].fillna('')
-
-                    # 文字列型に変換
-                    df_safe['feedback_reason'] = df_safe['feedback_reason'].astype(str)
-
-                    # 意味のあるフィードバックを持つ不満足回答をカウント
-                    def has_meaningful_reason(reason):
-                        if pd.isna(reason):
-                            return False
-                        str_reason = str(reason).strip()
-                        return (
-                            str_reason != '' and
-                            str_reason != 'nan' and
-                            str_reason != '（理由なし）' and
-                            len(str_reason) > 0
-                        )
-
-                    dissatisfied_with_reason = df_safe[
-                        (df_safe['satisfaction'] == '不満足') &
-                        df_safe['feedback_reason'].apply(has_meaningful_reason)
-                    ]
-
-                    reasons_provided = len(dissatisfied_with_reason)
+                    # 意味のあるフィードバックを持つ不満足回答を列演算でカウント
+                    reasons = df['feedback_reason'].astype('string').str.strip()
+                    meaningful_reason = reasons.notna() & ~reasons.isin(['', 'nan', '（理由なし）'])
+                    reasons_provided = int((meaningful_reason & (df['satisfaction'] == '不満足')).sum())
                     summary['dissatisfied_with_reason'] = reasons_provided
                     summary['dissatisfied_without_reason'] = dissatisfied - reasons_provided
                 except Exception as e:
                     # エラー時はフィードバック理由の統計を無効にする
-                    if st.secrets.get("DEBUG_MODE", False):
+                    if DEBUG_MODE:
                         st.warning(f"フィードバック理由の統計処理でエラー: {e}")
                     summary['dissatisfied_with_reason'] = 0
                     summary['dissatisfied_without_reason'] = dissatisfied
@@ -810,7 +1132,7 @@ class FeedbackManager:
             st.error(f"集計エラー: {str(e)}")
 
             # デバッグ情報（エラー時のみ表示）
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write("🔍 **エラーデバッグ情報**:")
                 try:
                     st.write(f"ファイルパス: {self.feedback_file}")
@@ -828,51 +1150,45 @@ class FeedbackManager:
 
             return {}
 
+    @staticmethod
+    def _truncate_text(texts: "pd.Series", limit: int = 100) -> "pd.Series":
+        """テキスト列を指定文字数で切り詰め（超過時は末尾に「...」、欠損値は"N/A"）"""
+        texts = texts.astype("string").fillna("N/A")
+        return texts.where(texts.str.len() <= limit, texts.str.slice(0, limit) + "...")
+
     def get_dissatisfaction_reasons(self, product_name: str = None) -> List[Dict[str, str]]:
         """不満足の理由一覧を取得（個別チャット単位）"""
+        import pandas as pd
 
         try:
             if not os.path.exists(self.feedback_file):
                 return []
 
-            df = pd.read_csv(self.feedback_file, encoding="utf-8")
+            # 商材で絞り込んだフィードバックデータ（集計と共有）
+            df = self._load_feedback(product_name)
 
-            # 製品フィルタリング
-            if product_name:
-                df = df[df["product_name"] == product_name]
+            # 不満足のフィードバックを抽出（行ごとのループではなく列単位で整形、欠けている列は欠損値で補完）
+            dissatisfied_df = df[df["satisfaction"] == "不満足"].reindex(columns=[
+                "timestamp", "product_name", "session_id", "chat_id", "message_sequence",
+                "user_message", "bot_response", "feedback_reason", "prompt_style",
+            ])
 
-            # 不満足のフィードバックを抽出
-            dissatisfied_df = df[df["satisfaction"] == "不満足"]
+            text_columns = ["timestamp", "product_name", "session_id", "chat_id"]
+            reasons_df = dissatisfied_df[text_columns].astype("string").fillna("")
+            reasons_df["message_sequence"] = (
+                pd.to_numeric(dissatisfied_df["message_sequence"], errors="coerce").fillna(0).astype(int)
+            )
+            reasons_df["user_question"] = self._truncate_text(dissatisfied_df["user_message"])
+            reasons_df["bot_answer"] = self._truncate_text(dissatisfied_df["bot_response"])
 
-            reasons = []
-            for _, row in dissatisfied_df.iterrows():
-                try:
-                    # 各フィールドを安全に取得
-                    user_message = str(row.get("user_message", "N/A"))
-                    bot_response = str(row.get("bot_response", "N/A"))
-                    feedback_reason = str(row.get("feedback_reason", "")).strip()
-
-                    # 空の場合のデフォルト値
-                    if not feedback_reason or feedback_reason == 'nan':
-                        feedback_reason = "（理由なし）"
-
-                    reasons.append({
-                        "timestamp": str(row.get("timestamp", "")),
-                        "product_name": str(row.get("product_name", "")),
-                        "session_id": str(row.get("session_id", "")),
-                        "chat_id": str(row.get("chat_id", "")),
-                        "message_sequence": int(row.get("message_sequence", 0)) if pd.notna(row.get("message_sequence")) else 0,
-                        "user_question": user_message[:100] + ("..." if len(user_message) > 100 else ""),
-                        "bot_answer": bot_response[:100] + ("..." if len(bot_response) > 100 else ""),
-                        "feedback_reason": feedback_reason,
-                        "prompt_style": str(row.get("prompt_style", ""))
-                    })
-                except Exception as row_error:
-                    # 個別行の処理でエラーが発生した場合はスキップ
-                    if st.secrets.get("DEBUG_MODE", False):
-                        st.warning(f"行の処理でエラー: {row_error}")
-                    continue
-            return reasons
+            # 空の場合のデフォルト値
+            feedback_reason = dissatisfied_df["feedback_reason"].astype("string").str.strip()
+            reasons_df["feedback_reason"] = feedback_reason.mask(
+                feedback_reason.isna() | feedback_reason.isin(["", "nan"]), "（理由なし）"
+            )
+            reasons_df["prompt_style"] = dissatisfied_df["prompt_style"].astype("string").fillna("")
+
+            return reasons_df.to_dict("records")
 
         except Exception as e:
             st.error(f"不満足理由取得エラー: {str(e)}")
@@ -882,16 +1198,26 @@ class FeedbackManager:
         """最近のチャット履歴を取得"""
 
         try:
+            self._drain_chat_log()
             if not os.path.exists(self.chat_log_file):
                 return []
 
-            df = pd.read_csv(self.chat_log_file, encoding="utf-8")
-            df = df[df["product_name"] == product_name]
+            # 全件をDataFrame化せず、該当製品の末尾limit件のみ保持しながら1パスで走査
+            # （回答に改行を含むため、行単位の逆読みではなくcsvモジュールで前方から解析）
+            with open(self.chat_log_file, newline="", encoding="utf-8") as f:
+                recent = deque(
+                    (row for row in csv.DictReader(f) if row.get("product_name") == product_name), maxlen=limit
+                )
 
-            # 最新順にソート
-            df = df.sort_values("timestamp", ascending=False).head(limit)
+            chats = list(recent)
+            for chat in chats:
+                for column in _CHAT_INT_COLUMNS:
+                    if column in chat:
+                        chat[column] = _to_int(chat[column])
 
-            return df.to_dict("records")
+            # 最新順にソート
+            chats.sort(key=lambda chat: chat.get("timestamp") or "", reverse=True)
+            return chats
 
         except Exception as e:
             st.error(f"履歴取得エラー: {str(e)}")
@@ -900,15 +1226,17 @@ class FeedbackManager:
     def show_satisfaction_survey(self, product_name: str, prompt_style: str):
         """満足度調査UIを表示（個別チャット単位）"""
 
-        if st.secrets.get("DEBUG_MODE", False):
+        if DEBUG_MODE:
             st.write(f"🔍 DEBUG: show_satisfaction_survey called for {product_name}")
 
+        session_state = st.session_state
+
         # 最新のチャット情報を取得
-        messages = st.session_state.get(f"messages_{product_name}", [])
-        if st.secrets.get("DEBUG_MODE", False):
+        messages = session_state.get(f"messages_{product_name}", [])
+        if DEBUG_MODE:
             st.write(f"🔍 DEBUG: Found {len(messages)} messages")
         if len(messages) < 2:
-            if st.secrets.get("DEBUG_MODE", False):
+            if DEBUG_MODE:
                 st.write("🔍 DEBUG: Not enough messages, skipping survey")
             return  # まだチャットがない場合は表示しない
 
@@ -933,18 +1261,20 @@ class FeedbackManager:
         message_sequence = len(messages) // 2  # user-assistantペアの数
         chat_id = self.generate_chat_id(session_id, message_sequence)
 
-        if st.secrets.get("DEBUG_MODE", False):
+        if DEBUG_MODE:
             st.write(f"🔍 DEBUG: session_id: {session_id}, message_sequence: {message_sequence}, chat_id: {chat_id}")
 
-        # このチャットに対してフィードバック済みかチェック
+        # このチャットに対してフィードバック済みかチェック（状態は1回だけ取得して使い回す）
         feedback_key = f"feedback_given_{chat_id}"
         dissatisfied_key = f"dissatisfied_selected_{chat_id}"
+        feedback_given = session_state.get(feedback_key, False)
+        dissatisfied_selected = session_state.get(dissatisfied_key, False)
 
-        if st.secrets.get("DEBUG_MODE", False):
-            st.write(f"🔍 DEBUG: feedback_key: {feedback_key}, already_given: {st.session_state.get(feedback_key, False)}")
+        if DEBUG_MODE:
+            st.write(f"🔍 DEBUG: feedback_key: {feedback_key}, already_given: {feedback_given}")
 
         # まだフィードバックを送信していない場合のみ表示
-        if not st.session_state.get(feedback_key, False):
+        if not feedback_given:
             with st.container():
                 st.divider()
                 st.subheader("📝 この回答について")
@@ -974,7 +1304,7 @@ class FeedbackManager:
                             feedback_reason=""
                         )
                         if success:
-                            st.session_state[feedback_key] = True
+                            session_state[feedback_key] = True
                             st.success("✅ フィードバックありがとうございます！")
                             st.rerun()
 
@@ -986,16 +1316,16 @@ class FeedbackManager:
                         use_container_width=True,
                     ):
                         # 不満足ボタンが押された場合、理由入力フォームを表示
-                        st.session_state[dissatisfied_key] = True
+                        session_state[dissatisfied_key] = True
                         st.rerun()
 
                 with col3:
                     if st.button("⏭️ スキップ", key=f"skip_{chat_id}", help="フィードバックを送信しない"):
-                        st.session_state[feedback_key] = True
+                        session_state[feedback_key] = True
                         st.rerun()
 
                 # 不満足が選択された場合、理由入力フォームを表示
-                if st.session_state.get(dissatisfied_key, False):
+                if dissatisfied_selected:
                     st.write("")  # スペース
                     st.write("**不満足の理由をお聞かせください（任意）：**")
 
@@ -1021,8 +1351,8 @@ class FeedbackManager:
                                 feedback_reason=feedback_reason.strip()
                             )
                             if success:
-                                st.session_state[feedback_key] = True
-                                st.session_state[dissatisfied_key] = False
+                                session_state[feedback_key] = True
+                                session_state[dissatisfied_key] = False
                                 st.info("📋 フィードバックありがとうございます。改善に努めます。")
                                 st.rerun()
 
@@ -1039,8 +1369,8 @@ class FeedbackManager:
                                 feedback_reason=""
                             )
                             if success:
-                                st.session_state[feedback_key] = True
-                                st.session_state[dissatisfied_key] = False
+                                session_state[feedback_key] = True
+                                session_state[dissatisfied_key] = False
                                 st.info("📋 フィードバックありがとうございます。改善に努めます。")
                                 st.rerun()
 
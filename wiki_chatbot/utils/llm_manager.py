@@ -29,14 +29,36 @@
 
 import os
 import sys
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import streamlit as st
 
 # 設定ファイルのインポート
 # 親ディレクトリのconfigモジュールにアクセスするためパスを追加
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.settings import get_current_llm_config, settings
+from config.settings import get_current_llm_config, set_tracked_session_setting, settings
+
+# トークン数計測（tiktoken がない環境では文字数で概算）
+try:
+    import tiktoken
+
+    _TOKEN_ENCODING = tiktoken.get_encoding("cl100k_base")
+    TIKTOKEN_AVAILABLE = True
+except Exception:
+    _TOKEN_ENCODING = None
+    TIKTOKEN_AVAILABLE = False
+
+
+# Anthropicのプロンプトキャッシュが有効になる最小トークン数（これ未満の cache_control は無視される）
+_ANTHROPIC_MIN_CACHE_TOKENS = 1024
+_ANTHROPIC_HAIKU_MIN_CACHE_TOKENS = 2048
+
+
+def count_tokens(text: str) -> int:
+    """テキストのトークン数（tiktoken 非対応時は日本語で過小評価しないよう文字数を使用）"""
+    if TIKTOKEN_AVAILABLE:
+        return len(_TOKEN_ENCODING.encode(text))
+    return len(text)
 
 
 class LLMManager:
@@ -204,8 +226,8 @@ class LLMManager:
             self.current_config = settings.get_model_config(provider, model)
 
             # セッション状態を更新
-            st.session_state["selected_provider"] = provider
-            st.session_state[f"selected_model_{provider}"] = model
+            set_tracked_session_setting("selected_provider", provider)
+            set_tracked_session_setting(f"selected_model_{provider}", model)
         else:
             raise ValueError(f"プロバイダー '{provider}' は利用できません")
 
@@ -240,6 +262,155 @@ class LLMManager:
         else:
             raise ValueError(f"未対応のプロバイダー: {self.current_provider}")
 
+    def stream_response(
+        self, messages: List[Dict[str, str]], usage: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> Iterator[str]:
+        """統合ストリーミングレスポンス生成（テキスト断片を順次返し、完了後に usage へ使用情報を格納）"""
+        if not self.current_provider:
+            raise ValueError("プロバイダーが選択されていません。設定画面でLLMプロバイダーを選択してください。")
+
+        if self.current_provider not in self.providers:
+            available_providers = list(self.providers.keys())
+            if available_providers:
+                error_msg = f"プロバイダー '{self.current_provider}' が利用できません。利用可能: {available_providers}"
+            else:
+                error_msg = "利用可能なプロバイダーがありません。API Keyが正しく設定されているか確認してください。"
+            raise ValueError(error_msg)
+
+        usage = usage if usage is not None else {}
+        if self.current_provider == "openai":
+            yield from self._stream_openai_response(messages, usage, **kwargs)
+        elif self.current_provider == "anthropic":
+            yield from self._stream_anthropic_response(messages, usage, **kwargs)
+        elif self.current_provider == "google":
+            yield from self._stream_google_response(messages, usage, **kwargs)
+        else:
+            raise ValueError(f"未対応のプロバイダー: {self.current_provider}")
+
+    def _set_stream_usage(self, usage: Dict[str, Any], input_tokens: int, output_tokens: int) -> None:
+        """ストリーミング完了後の使用情報を格納"""
+        usage.update(
+            {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "cost": settings.calculate_cost(
+                    self.current_provider, self.current_model, input_tokens, output_tokens
+                ),
+            }
+        )
+
+    def _set_estimated_stream_usage(self, usage: Dict[str, Any], input_text: str, output_parts: List[str]) -> None:
+        """プロバイダーから使用量が得られなかった場合にトークン数を計測して格納"""
+        self._set_stream_usage(usage, count_tokens(input_text), count_tokens("".join(output_parts)))
+
+    def _stream_openai_response(
+        self, messages: List[Dict[str, str]], usage: Dict[str, Any], **kwargs
+    ) -> Iterator[str]:
+        """OpenAI ストリーミングレスポンス生成"""
+        client = self.providers["openai"]["client"]
+
+        params = {
+            "model": self.current_model,
+            "messages": messages,
+            "max_tokens": kwargs.get("max_tokens", self.current_config.max_tokens),
+            "temperature": kwargs.get("temperature", self.current_config.temperature),
+            "top_p": kwargs.get("top_p", self.current_config.top_p),
+            "frequency_penalty": kwargs.get("frequency_penalty", self.current_config.frequency_penalty),
+            "presence_penalty": kwargs.get("presence_penalty", self.current_config.presence_penalty),
+            "stream": True,
+            # 最終チャンクで実際の使用量を受け取る
+            "stream_options": {"include_usage": True},
+        }
+
+        output_parts = []
+        stream_usage = None
+        for chunk in client.chat.completions.create(**params):
+            stream_usage = getattr(chunk, "usage", None) or stream_usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                text = chunk.choices[0].delta.content
+                output_parts.append(text)
+                yield text
+
+        if stream_usage is not None:
+            self._set_stream_usage(usage, stream_usage.prompt_tokens, stream_usage.completion_tokens)
+        else:
+            self._set_estimated_stream_usage(usage, "".join(msg["content"] for msg in messages), output_parts)
+
+    def _stream_anthropic_response(
+        self, messages: List[Dict[str, str]], usage: Dict[str, Any], **kwargs
+    ) -> Iterator[str]:
+        """Anthropic (Claude) ストリーミングレスポンス生成"""
+        client = self.providers["anthropic"]["client"]
+
+        anthropic_messages = []
+        system_message = ""
+        for msg in messages:
+            if msg["role"] == "system":
+                system_message = msg["content"]
+            else:
+                anthropic_messages.append({"role": msg["role"], "content": msg["content"]})
+
+        params = {
+            "model": self.current_model,
+            "messages": anthropic_messages,
+            "max_tokens": kwargs.get("max_tokens", self.current_config.max_tokens),
+            "temperature": kwargs.get("temperature", self.current_config.temperature),
+            "top_p": kwargs.get("top_p", self.current_config.top_p),
+            "stream": True,
+        }
+        if system_message:
+            params["system"] = self._anthropic_system_param(system_message, kwargs.get("system_prefix"))
+
+        input_tokens = output_tokens = 0
+        for event in client.messages.create(**params):
+            if event.type == "message_start":
+                input_tokens = event.message.usage.input_tokens
+            elif event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                yield event.delta.text
+            elif event.type == "message_delta":
+                output_tokens = event.usage.output_tokens
+
+        self._set_stream_usage(usage, input_tokens, output_tokens)
+
+    def _stream_google_response(
+        self, messages: List[Dict[str, str]], usage: Dict[str, Any], **kwargs
+    ) -> Iterator[str]:
+        """Google (Gemini) ストリーミングレスポンス生成"""
+        genai = self.providers["google"]["client"]
+        model = genai.GenerativeModel(self.current_model)
+
+        conversation_text = ""
+        for msg in messages:
+            if msg["role"] == "system":
+                conversation_text += f"System: {msg['content']}\n\n"
+            elif msg["role"] == "user":
+                conversation_text += f"User: {msg['content']}\n\n"
+            elif msg["role"] == "assistant":
+                conversation_text += f"Assistant: {msg['content']}\n\n"
+
+        generation_config = {
+            "temperature": kwargs.get("temperature", self.current_config.temperature),
+            "top_p": kwargs.get("top_p", self.current_config.top_p),
+            "max_output_tokens": kwargs.get("max_tokens", self.current_config.max_tokens),
+        }
+
+        output_parts = []
+        usage_metadata = None
+        for chunk in model.generate_content(conversation_text, generation_config=generation_config, stream=True):
+            # 使用量は最終チャンクの usage_metadata に累計で含まれる
+            usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+            if chunk.text:
+                output_parts.append(chunk.text)
+                yield chunk.text
+
+        if usage_metadata is not None and getattr(usage_metadata, "prompt_token_count", None):
+            self._set_stream_usage(
+                usage, usage_metadata.prompt_token_count, usage_metadata.candidates_token_count or 0
+            )
+        else:
+            self._set_estimated_stream_usage(usage, conversation_text, output_parts)
+
     def _generate_openai_response(self, messages: List[Dict[str, str]], **kwargs) -> Tuple[str, Dict[str, Any]]:
         """OpenAI レスポンス生成"""
         try:
@@ -301,7 +472,7 @@ class LLMManager:
             }
 
             if system_message:
-                params["system"] = system_message
+                params["system"] = self._anthropic_system_param(system_message, kwargs.get("system_prefix"))
 
             response = client.messages.create(**params)
 
@@ -324,6 +495,21 @@ class LLMManager:
             st.error(f"Anthropic API エラー: {str(e)}")
             return f"❌ Anthropic API エラーが発生しました: {str(e)}", {"error": str(e)}
 
+    def _anthropic_system_param(self, system_message: str, system_prefix: Optional[str]) -> Any:
+        """静的なプレフィックスがキャッシュ可能な長さであればプロンプトキャッシュ対象のブロックとして分割"""
+        if not system_prefix or not system_message.startswith(system_prefix):
+            return system_message
+
+        is_haiku = "haiku" in (self.current_model or "")
+        min_tokens = _ANTHROPIC_HAIKU_MIN_CACHE_TOKENS if is_haiku else _ANTHROPIC_MIN_CACHE_TOKENS
+        if count_tokens(system_prefix) < min_tokens:
+            return system_message
+
+        blocks = [{"type": "text", "text": system_prefix, "cache_control": {"type": "ephemeral"}}]
+        if len(system_message) > len(system_prefix):
+            blocks.append({"type": "text", "text": system_message[len(system_prefix) :]})
+        return blocks
+
     def _generate_google_response(self, messages: List[Dict[str, str]], **kwargs) -> Tuple[str, Dict[str, Any]]:
         """Google (Gemini) レスポンス生成"""
         try:
@@ -62,10 +62,13 @@
 import logging
 import os
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import yaml
 
+# context_text の挿入位置を特定するための区切り文字（テンプレート本文には現れない制御文字）
+_CONTEXT_MARKER = "\x00context_text\x00"
+
 
 @dataclass
 class PromptConfig:
@@ -182,6 +185,7 @@ class PromptManager:
         self.product_prompts: Dict[str, Dict[str, Any]] = {}       # 製品固有プロンプト階層格納辞書
         self.rag_prompts: Dict[str, Dict[str, PromptConfig]] = {}  # RAG用プロンプト分類別格納辞書
         self.logger: logging.Logger = logging.getLogger(__name__) # ログ管理オブジェクト
+        self.generation: int = 0                                   # 読み込み回数（呼び出し側キャッシュの無効化用）
 
         # プロンプト設定の一括読み込み実行
         self._load_all_prompts()
@@ -207,6 +211,8 @@ class PromptManager:
             # Load RAG-specific prompts
             self._load_rag_prompts()
 
+            self.generation += 1
+
             self.logger.info(
                 f"Prompt loading completed: "
                 f"generic={len(self.generic_prompts)}, "
@@ -322,6 +328,30 @@ class PromptManager:
         # 3. Default prompt
         return self._get_default_system_prompt(product_name or "システム", **kwargs)
 
+    def get_system_prompt_parts(
+        self, prompt_type: str, product_name: Optional[str] = None, **kwargs: Any
+    ) -> Tuple[str, str]:
+        """システムプロンプトを静的な前半と動的な後半に分割して取得する。
+
+        context_text（RAG検索結果）より前の部分はスタイル・製品・会社名のみで決まるため、
+        LLMプロバイダーのプレフィックスキャッシュの対象にできます。
+
+        Args:
+            prompt_type: 取得するプロンプトのタイプ/ID。
+            product_name: 製品固有プロンプト用の製品名。
+            **kwargs: get_system_prompt() と同じテンプレート置換用の変数。
+
+        Returns:
+            (static_prefix, dynamic_suffix) のタプル。連結すると get_system_prompt() の結果と一致します。
+        """
+        context_text = kwargs.pop("context_text", "")
+        rendered = self.get_system_prompt(prompt_type, product_name, context_text=_CONTEXT_MARKER, **kwargs)
+        prefix, marker, rest = rendered.partition(_CONTEXT_MARKER)
+        if not marker:
+            # テンプレートに context_text がない場合は全体が静的
+            return rendered, ""
+        return prefix, context_text + rest.replace(_CONTEXT_MARKER, context_text)
+
     def get_user_prompt(self, prompt_type: str, product_name: str = None, **kwargs) -> str:
         """ユーザープロンプトを取得（製品別優先）"""
 
@@ -344,13 +374,17 @@ class PromptManager:
         self, category: str, variant: str = "generic", prompt_part: str = "system_prompt", **kwargs
     ) -> str:
         """RAG用プロンプトを取得"""
+        template = self.get_rag_prompt_template(category, variant, prompt_part)
+        return self._format_prompt(template, **kwargs) if template else ""
 
-        if category in self.rag_prompts and variant in self.rag_prompts[category]:
-            prompt_config = self.rag_prompts[category][variant]
-            prompt_text = getattr(prompt_config, prompt_part, "")
-            return self._format_prompt(prompt_text, **kwargs)
-
-        return ""
+    def get_rag_prompt_template(
+        self, category: str, variant: str = "generic", prompt_part: str = "system_prompt"
+    ) -> str:
+        """RAG用プロンプトのテンプレートを変数置換せずに取得（存在確認用）"""
+        prompt_config = self.rag_prompts.get(category, {}).get(variant)
+        if prompt_config is None:
+            return ""
+        return getattr(prompt_config, prompt_part, "")
 
     def _has_product_prompt(self, product_name: str, prompt_type: str) -> bool:
         """製品別プロンプトが存在するかチェック"""
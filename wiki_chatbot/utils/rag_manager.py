@@ -16,6 +16,9 @@ class RAGManager:
     _chroma_client = None
     _chroma_settings = None
     _chroma_dir = None
+    _query_embedding_function = None
+    # 文書の追加・削除ごとに加算（検索結果を再利用するキャッシュの無効化に使用）
+    data_version = 0
 
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
@@ -491,6 +494,7 @@ class RAGManager:
                     st.success(f"✅ {qa_count}組のQ&Aペア（うち{reference_count}件は参照データ付き）を追加しました")
                 else:
                     st.success(f"✅ {qa_count}組のQ&Aペアを追加しました")
+                RAGManager.data_version += 1
                 return True
             else:
                 st.error("CSVファイルには質問と回答の2列が必要です")
@@ -572,6 +576,7 @@ class RAGManager:
                     st.success(f"✅ {len(chunks)}個のチャンクをChromeDBに追加完了")
 
             os.remove(temp_file_path)
+            RAGManager.data_version += 1
             return True
 
         except Exception as e:
@@ -596,6 +601,7 @@ class RAGManager:
             if results and results["ids"]:
                 try:
                     collection.delete(ids=results["ids"])
+                    RAGManager.data_version += 1
                     return True
                 except Exception as delete_error:
                     if "readonly database" in str(delete_error) or "database is locked" in str(delete_error):
@@ -606,6 +612,7 @@ class RAGManager:
                             results = collection.get(where={"file_name": file_name})
                             if results and results["ids"]:
                                 collection.delete(ids=results["ids"])
+                                RAGManager.data_version += 1
                                 return True
                     else:
                         raise delete_error
@@ -707,6 +714,19 @@ class RAGManager:
             st.error(f"Error searching: {e}")
             return []
 
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        """コレクションと同じ埋め込み関数でクエリをベクトル化（利用不可時はNone）"""
+        try:
+            if RAGManager._query_embedding_function is None:
+                from chromadb.utils import embedding_functions
+
+                RAGManager._query_embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            return list(RAGManager._query_embedding_function([query])[0])
+        except Exception as e:
+            if st.secrets.get("DEBUG_MODE", False):
+                st.warning(f"クエリ埋め込みエラー: {e}")
+            return None
+
     def list_documents(self, product_name: str) -> List[str]:
         if not self.chroma_available:
             return []
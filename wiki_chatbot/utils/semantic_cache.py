@@ -0,0 +1,121 @@
+"""セマンティッククエリキャッシュ。
+
+質問の埋め込みベクトルをランダム射影LSH（Locality Sensitive Hashing）で
+バケット化し、ほぼ同一の質問に対して過去の検索結果と回答を再利用します。
+キャッシュヒット時はベクトル検索とLLM呼び出しの両方を省略できます。
+
+使用例:
+    ```python
+    cache = SemanticCache(threshold=0.95)
+    hit = cache.get(vector, scope=("商品A", "general"))
+    if hit is None:
+        cache.put(vector, scope=("商品A", "general"), value=(search_results, response))
+    ```
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """ランダム射影LSHによる近似一致キャッシュ（プロセス内共有・スレッドセーフ）"""
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        num_tables: int = 4,
+        num_bits: int = 12,
+        max_entries: int = 1024,
+        seed: int = 0,
+    ):
+        self.threshold = threshold
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.max_entries = max_entries
+        self._rng = np.random.default_rng(seed)
+        self._planes: Optional[np.ndarray] = None  # (num_tables, num_bits, dim)
+        self._bit_weights = 1 << np.arange(num_bits, dtype=np.int64)
+        self._tables: List[Dict[Tuple[Hashable, int], Set[int]]] = [{} for _ in range(num_tables)]
+        # entry_id -> (scope, 正規化済みベクトル, バケットキー, 値)（LRU順）
+        self._entries: "OrderedDict[int, Tuple[Hashable, np.ndarray, Tuple[int, ...], Any]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _normalize(self, vector: Sequence[float]) -> Optional[np.ndarray]:
+        """ベクトルを単位長に正規化（次元不一致・ゼロベクトルはNone）"""
+        vec = np.asarray(vector, dtype=np.float32).ravel()
+        if self._planes is None:
+            self._planes = self._rng.standard_normal((self.num_tables, self.num_bits, vec.size)).astype(np.float32)
+        elif vec.size != self._planes.shape[2]:
+            return None
+        norm = float(np.linalg.norm(vec))
+        if norm == 0.0:
+            return None
+        return vec / norm
+
+    def _bucket_keys(self, vec: np.ndarray) -> Tuple[int, ...]:
+        """各テーブルの符号ビットを整数に詰めたバケットキー"""
+        bits = (self._planes @ vec) > 0  # (num_tables, num_bits)
+        return tuple(int(key) for key in bits.astype(np.int64) @ self._bit_weights)
+
+    def get(self, vector: Sequence[float], scope: Hashable) -> Optional[Any]:
+        """類似度が閾値を超える最も近いエントリの値を返す（なければNone）"""
+        with self._lock:
+            vec = self._normalize(vector)
+            if vec is None:
+                return None
+            keys = self._bucket_keys(vec)
+
+            candidates: Set[int] = set()
+            for table, key in zip(self._tables, keys):
+                candidates |= table.get((scope, key), set())
+            if not candidates:
+                return None
+
+            best_id, best_sim = None, self.threshold
+            for entry_id in candidates:
+                sim = float(self._entries[entry_id][1] @ vec)
+                if sim > best_sim:
+                    best_id, best_sim = entry_id, sim
+            if best_id is None:
+                return None
+
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][3]
+
+    def put(self, vector: Sequence[float], scope: Hashable, value: Any) -> None:
+        """エントリを追加し、上限を超えた分は古い順に破棄"""
+        with self._lock:
+            vec = self._normalize(vector)
+            if vec is None:
+                return
+            keys = self._bucket_keys(vec)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, vec, keys, value)
+            for table, key in zip(self._tables, keys):
+                table.setdefault((scope, key), set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        """最も長く使われていないエントリを削除"""
+        entry_id, (scope, _, keys, _) = self._entries.popitem(last=False)
+        for table, key in zip(self._tables, keys):
+            bucket = table.get((scope, key))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[(scope, key)]
+
+    def clear(self) -> None:
+        """全エントリを削除（文書更新時などに使用）"""
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()